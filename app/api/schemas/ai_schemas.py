@@ -0,0 +1,9 @@
+from pydantic import BaseModel, confloat
+from typing import Optional
+
+
+class SearchFiltersSchema(BaseModel):
+
+    min_price: Optional[confloat(ge=0)] = None
+    max_price: Optional[confloat(ge=0)] = None
+    seller_id: Optional[int] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, constr, PositiveFloat, field_validator
+from pydantic import BaseModel, constr, conint, confloat, PositiveFloat, field_validator
 from typing import Optional, List
 
 
@@ -53,12 +53,29 @@ class ProductSummarySchema(BaseModel):
 class ProductsListSchema(BaseModel):
 
     products: List[ProductSummarySchema]
+    next_cursor: Optional[str] = None
 
     model_config = {
         "from_attributes": True
     }
 
 
+class ProductsQuerySchema(BaseModel):
+
+    limit: conint(ge=1, le=100) = 20
+    cursor: Optional[str] = None
+    min_price: Optional[confloat(ge=0)] = None
+    max_price: Optional[confloat(ge=0)] = None
+    seller_id: Optional[int] = None
+
+
+class SimilarProductsQuerySchema(BaseModel):
+
+    limit: conint(ge=1, le=50) = 10
+    min_price: Optional[confloat(ge=0)] = None
+    max_price: Optional[confloat(ge=0)] = None
+
+
 class ProductUpdateSchema(BaseModel):
 
     name: Optional[constr(min_length=1, max_length=128)]
@@ -1,29 +1,49 @@
 import os
 import re
 import json
-import chromadb
+import hashlib
+import requests
 import traceback
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from langchain_chroma import Chroma
 from langchain.llms.base import LLM
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from chroma.collections import chroma_breaker, embed_query, get_client, has_sold_metadata, get_active_collection_name
+from api.schemas.ai_schemas import SearchFiltersSchema
+from api.views.services.search_service import build_where, hybrid_search
+from api.views.services.circuit_breaker import ServiceUnavailable
+from api.views.services.generation_gate import GenerationRejected, generation_gate, ollama_breaker, ollama_timeout
+from cache.search_cache import (
+    cache_result,
+    normalize_query,
+    get_cached_result,
+    get_index_generation,
+    get_similar_cached_result,
+)
 
 
 load_dotenv()
 
 ai_search_bp = Blueprint("ai_search", __name__, url_prefix="/ai_search")
 
-chromadb_host = os.getenv("CHROMADB_HOST", "chroma")
 ollama_api = os.getenv("OLLAMA_API", "http://ollama:11434/api/chat")
 llm_model_name = os.getenv("LLM_MODEL_NAME", "mistral:7b-instruct")
-client = chromadb.HttpClient(host=chromadb_host, port=8000)
-chromadb_collections = "products"
-top_results_n = 100
+top_results_n = int(os.getenv("SEARCH_TOP_K", 100))
+# Candidates less similar than this (cosine) to the query never reach the prompt.
+search_min_similarity = float(os.getenv("SEARCH_MIN_SIMILARITY", 0.2))
+context_token_budget = int(os.getenv("SEARCH_CONTEXT_TOKENS", 2000))
+context_description_chars = int(os.getenv("SEARCH_DESCRIPTION_CHARS", 200))
+fast_results_n = 20
+search_modes = ("llm", "fast")
+
+# Process-wide clients, reused by every request the worker serves.
+ollama_session = requests.Session()
+_vectorstore = None
 
 
 class OllamaLLM(LLM, BaseModel):
@@ -37,20 +57,21 @@ class OllamaLLM(LLM, BaseModel):
     def _llm_type(self) -> str:
         return "ollama"
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        import requests
-
-        payload = {
+    def _payload(self, prompt: str, stream: bool) -> dict:
+        return {
             "model": self.model_name,
             "messages": [
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": prompt},
             ],
-            "stream": False,
+            "stream": stream,
         }
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        payload = self._payload(prompt, stream=False)
         headers = {"Content-Type": "application/json"}
 
-        response = requests.post(self.base_url, json=payload, headers=headers)
+        response = ollama_session.post(self.base_url, json=payload, headers=headers, timeout=ollama_timeout)
         response.raise_for_status()
         data = response.json()
 
@@ -59,12 +80,37 @@ class OllamaLLM(LLM, BaseModel):
         except (KeyError, IndexError):
             return data.get("result", "")
 
+    def stream_text(self, prompt: str) -> Iterator[str]:
+
+        """Yield the completion piece by piece from Ollama's streamed NDJSON response."""
 
-def get_chroma_collection():
+        payload = self._payload(prompt, stream=True)
+        headers = {"Content-Type": "application/json"}
+
+        with ollama_session.post(
+            self.base_url, json=payload, headers=headers, stream=True, timeout=ollama_timeout
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                content = data.get("message", {}).get("content")
+                if content:
+                    yield content
+                if data.get("done"):
+                    break
+
+
+def get_vectorstore() -> Chroma:
 
-    """Retrieve or create the ChromaDB collection for products."""
+    """Return the LangChain store of the active collection, built once per worker and collection."""
 
-    return client.get_or_create_collection(name=chromadb_collections)
+    global _vectorstore
+    name = get_active_collection_name()
+    if _vectorstore is None or _vectorstore[0] != name:
+        _vectorstore = (name, Chroma(client=get_client(), collection_name=name))
+    return _vectorstore[1]
 
 
 product_prompt_template = """
@@ -101,84 +147,371 @@ prompt = PromptTemplate(
     template=product_prompt_template,
 )
 
+llm = OllamaLLM(model_name=llm_model_name, base_url=ollama_api)
 
-def parse_and_filter_products(text: str, metadatas: List[dict]) -> str:
 
-    """Parse LLM output and filter matching products with proper formatting."""
+product_pattern = re.compile(
+    r"Product\s+#\d+:\s+Name:\s*(.+?),\s*Price:\s*(.+?),\s*Description:\s*(.+)"
+)
 
-    product_pattern = re.compile(
-        r"Product\s+#\d+:\s+Name:\s*(.+?),\s*Price:\s*(.+?),\s*Description:\s*(.+)"
-    )
-    matched = []
-    price_map = {md["name"]: md.get("price", "Not specified") for md in metadatas}
 
-    for line in text.splitlines():
-        m = product_pattern.match(line.strip())
-        if not m:
-            continue
-        name, _, description = m.group(1).strip(), m.group(2).strip(), m.group(3).strip()
+def parse_product_line(line: str, price_map: Optional[dict] = None):
+
+    """
+    Parse one 'Product #n' line into (name, price, description), or None. With a price_map
+    the price is taken from the retrieved metadata; without one the line's own price is kept.
+    """
 
-        description = re.sub(r"\s*\(.*?\)\s*", "", description).strip()
+    m = product_pattern.match(line.strip())
+    if not m:
+        return None
+    name, price_str, description = m.group(1).strip(), m.group(2).strip(), m.group(3).strip()
 
+    description = re.sub(r"\s*\(.*?\)\s*", "", description).strip()
+
+    if price_map is not None:
         price = price_map.get(name, "Not specified")
         price_str = f"{price} UAH" if isinstance(price, (int, float)) else str(price)
 
-        matched.append((name, price_str, description))
+    return name, price_str, description
+
+
+def build_price_map(metadatas: List[dict]) -> dict:
+    return {md["name"]: md.get("price", "Not specified") for md in metadatas}
+
+
+def format_product_line(i: int, name: str, price: str, description: str) -> str:
+    return f"Product #{i}: Name: {name}, Price: {price}, Description: {description}"
+
+
+def parse_and_filter_products(text: str, metadatas: List[dict]) -> str:
+
+    """Parse LLM output and filter matching products with proper formatting."""
+
+    price_map = build_price_map(metadatas)
+    matched = [
+        product
+        for product in (parse_product_line(line, price_map) for line in text.splitlines())
+        if product
+    ]
 
     if not matched:
         return "No matching products."
 
     lines = []
     for i, (name, price, desc) in enumerate(matched, start=1):
-        lines.append(f"Product #{i}: Name: {name}, Price: {price}, Description: {desc}")
+        lines.append(format_product_line(i, name, price, desc))
 
     return "\n".join(lines)
 
 
+def retrieve_products(query_embedding, filters: Optional[dict] = None):
+
+    """
+    Run the vector search once for an already embedded query with the filters pushed into
+    Chroma's where clause, and keep only documents above the similarity cutoff, best first.
+    """
+
+    with chroma_breaker.guard("query"):
+        results = get_vectorstore().similarity_search_by_vector_with_relevance_scores(
+            list(map(float, query_embedding)),
+            k=top_results_n,
+            filter=build_where(filters, has_sold_metadata(get_active_collection_name())),
+        )
+    # Collections use Chroma's default squared L2 space over unit-length embeddings,
+    # where distance = 2 - 2 * cosine similarity.
+    max_distance = 2 * (1 - search_min_similarity)
+    return [doc for doc, distance in results if distance <= max_distance and not doc.metadata.get("is_sold")]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def truncate_description(description: str, limit: int = context_description_chars) -> str:
+    description = " ".join((description or "").split())
+    if len(description) <= limit:
+        return description
+    return description[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def pack_context(docs) -> str:
+
+    """Context lines for the best-ranked documents that fit into context_token_budget."""
+
+    lines, tokens = [], 0
+    for doc in docs:
+        line = (
+            f"Name: {doc.metadata.get('name')}, Price: {doc.metadata.get('price')} UAH, "
+            f"Description: {truncate_description(doc.metadata.get('description'))}"
+        )
+        cost = estimate_tokens(line)
+        if lines and tokens + cost > context_token_budget:
+            break
+        lines.append(line)
+        tokens += cost
+    return "\n".join(lines)
+
+
+def build_prompt(user_query: str, docs) -> str:
+
+    """Render the product prompt with the retrieved documents packed as context."""
+
+    return prompt.format(context=pack_context(docs), question=user_query)
+
+
+def generate_answer(prompt_text: str) -> str:
+
+    """Run one LLM generation through the admission gate; identical concurrent prompts share it."""
+
+    def generate():
+        with ollama_breaker.guard("generate"):
+            return llm.invoke(prompt_text)
+
+    key = hashlib.sha1(prompt_text.encode()).hexdigest()
+    return generation_gate.run(key, generate)
+
+
+def search_cache_key(user_query: str, filters: dict) -> str:
+    normalized_query = normalize_query(user_query)
+    return f"{normalized_query}|{json.dumps(filters, sort_keys=True)}" if filters else normalized_query
+
+
+def embed_search_query(user_query: str):
+
+    """Embed a search query; any embedding failure is raised as ServiceUnavailable."""
+
+    try:
+        return embed_query(user_query)
+    except Exception as e:
+        raise ServiceUnavailable(f"Embedding model is unavailable: {e}") from e
+
+
+def lookup_cached_result(generation: str, cache_key: str, user_query: str, filters: dict):
+
+    """
+    Exact then semantic cache lookup; returns (cached result or None, query embedding or None).
+    Similar-query matches are only reused for unfiltered searches. Raises ServiceUnavailable
+    if the query cannot be embedded.
+    """
+
+    cached = get_cached_result(generation, cache_key)
+    if cached is not None:
+        return cached, None
+
+    query_embedding = embed_search_query(user_query)
+    if not filters:
+        cached = get_similar_cached_result(generation, query_embedding)
+    return cached, query_embedding
+
+
+def format_products(products: List[dict]) -> str:
+
+    """Render structured results in the same 'Product #n' text format the LLM path returns."""
+
+    if not products:
+        return "No matching products."
+
+    return "\n".join(
+        format_product_line(i, product["name"], f"{product['price']} UAH", product["description"])
+        for i, product in enumerate(products, start=1)
+    )
+
+
+def run_fast_search(user_query: str, query_embedding=None, filters: Optional[dict] = None, embed: bool = True) -> dict:
+
+    """
+    LLM-free search: BM25 and vector rankings fused in-process, returned as structured results.
+    Without query_embedding the query is embedded here unless embed is False; with no
+    embedding the ranking is BM25 only.
+    """
+
+    if query_embedding is None and embed:
+        try:
+            query_embedding = embed_search_query(user_query)
+        except ServiceUnavailable as e:
+            print(f"⚠️ {e}, ranking with BM25 only")
+
+    products = hybrid_search(
+        user_query,
+        query_embedding,
+        limit=fast_results_n,
+        candidates=top_results_n,
+        filters=filters,
+    )
+    return {"mode": "fast", "result": format_products(products), "results": products}
+
+
+def run_search(user_query: str, filters: Optional[dict] = None) -> dict:
+
+    """
+    LLM search pipeline: exact then semantic cache lookup, and on a miss one filtered
+    retrieval, one prompt build and one LLM call. The query is embedded once and that
+    vector serves both the similarity cache and the retrieval. Falls back to fast mode
+    when the embedding model, Chroma or Ollama is unavailable or the LLM is saturated.
+    """
+
+    filters = filters or {}
+    generation = get_index_generation()
+    cache_key = search_cache_key(user_query, filters)
+    query_embedding = None
+
+    try:
+        cached, query_embedding = lookup_cached_result(generation, cache_key, user_query, filters)
+        if cached is not None:
+            return {"mode": "llm", "result": cached}
+
+        docs = retrieve_products(query_embedding, filters)
+        answer_text = generate_answer(build_prompt(user_query, docs)) if docs else None
+    except (ServiceUnavailable, GenerationRejected) as e:
+        print(f"⚠️ {e}, falling back to fast search")
+        # A missing embedding means embedding just failed; do not try it again.
+        return run_fast_search(user_query, query_embedding, filters, embed=False)
+
+    if answer_text is None:
+        result = "No matching products."
+    else:
+        result = parse_and_filter_products(answer_text, [doc.metadata for doc in docs])
+
+    cache_result(generation, cache_key, None if filters else query_embedding, result)
+    return {"mode": "llm", "result": result}
+
+
 @ai_search_bp.route("/search", methods=["POST"])
 def search():
 
-    """Handle product search requests by querying ChromaDB and the Ollama LLM."""
+    """
+    Handle product search requests; send JSON with 'query', optional 'mode' and optional
+    'min_price', 'max_price', 'seller_id' filters: 'llm' (default) filters candidates
+    through Ollama, 'fast' ranks them with BM25 + vectors only.
+    """
 
     try:
         data = request.json or {}
         user_query = data.get("query", "").strip()
+        mode = data.get("mode", "llm")
 
         if not user_query:
             return jsonify({"error": "Query is required"}), 400
+        if mode not in search_modes:
+            return jsonify({"error": f"Mode must be one of: {', '.join(search_modes)}"}), 400
+
+        try:
+            filters = SearchFiltersSchema(**data).model_dump(exclude_none=True)
+        except ValidationError as e:
+            return jsonify({"errors": e.errors()}), 400
+
+        if mode == "fast":
+            return jsonify(run_fast_search(user_query, filters=filters))
+        return jsonify(run_search(user_query, filters))
 
-        collection = get_chroma_collection()
-        if not collection.count():
-            return jsonify({"error": "No products indexed"}), 500
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-        vectorstore = Chroma(client=client, collection_name=chromadb_collections)
-        retriever = vectorstore.as_retriever(search_kwargs={"k": top_results_n})
-        llm = OllamaLLM(model_name=llm_model_name, base_url=ollama_api)
 
-        docs = retriever.invoke(user_query)
-        if not docs:
-            return jsonify({"result": "No matching products."})
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def product_event(position: int, name: str, price: str, description: str) -> str:
+    return sse_event("product", {
+        "position": position,
+        "name": name,
+        "price": price,
+        "description": description,
+    })
 
-        context_str = "\n".join(
-            f"Name: {doc.metadata.get('name')}, Price: {doc.metadata.get('price')} UAH, Description: {doc.metadata.get('description')}"
-            for doc in docs
-        )
-        final_prompt = product_prompt_template.replace("{context}", context_str).replace("{question}", user_query)
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            chain_type_kwargs={"prompt": prompt},
-            return_source_documents=False,
-        )
 
-        llm_response = qa_chain.invoke(user_query)
-        answer_text = llm_response.get("result") if isinstance(llm_response, dict) else str(llm_response)
+def stream_search_events(user_query: str, filters: Optional[dict] = None) -> Iterator[str]:
 
-        corrected_answer = parse_and_filter_products(answer_text, [doc.metadata for doc in docs])
+    """
+    Run the LLM search pipeline with a streamed Ollama completion and yield one SSE
+    'product' event per completed 'Product #n' line as soon as it is generated, then a
+    'done' event. Cached answers are replayed; if the embedding model, Chroma or Ollama
+    fails or the LLM is saturated before the first product, fast-mode results are streamed instead.
+    """
 
-        return jsonify({"result": corrected_answer})
+    filters = filters or {}
+
+    try:
+        generation = get_index_generation()
+        cache_key = search_cache_key(user_query, filters)
+        lines, buffer, query_embedding = [], "", None
+
+        try:
+            cached, query_embedding = lookup_cached_result(generation, cache_key, user_query, filters)
+
+            if cached is not None:
+                products = [p for p in (parse_product_line(line) for line in cached.splitlines()) if p]
+                for position, product in enumerate(products, start=1):
+                    yield product_event(position, *product)
+                yield sse_event("done", {"mode": "llm", "count": len(products), "cached": True})
+                return
+
+            docs = retrieve_products(query_embedding, filters)
+            if not docs:
+                cache_result(generation, cache_key, None if filters else query_embedding, "No matching products.")
+                yield sse_event("done", {"mode": "llm", "count": 0})
+                return
+
+            price_map = build_price_map([doc.metadata for doc in docs])
+            with generation_gate.slot(), ollama_breaker.guard("stream"):
+                for chunk in llm.stream_text(build_prompt(user_query, docs)):
+                    buffer += chunk
+                    *completed, buffer = buffer.split("\n")
+                    for line in completed:
+                        product = parse_product_line(line, price_map)
+                        if product:
+                            lines.append(format_product_line(len(lines) + 1, *product))
+                            yield product_event(len(lines), *product)
+
+            product = parse_product_line(buffer, price_map)
+            if product:
+                lines.append(format_product_line(len(lines) + 1, *product))
+                yield product_event(len(lines), *product)
+
+        except (ServiceUnavailable, GenerationRejected) as e:
+            if lines:
+                yield sse_event("error", {"error": f"LLM stream interrupted: {e}"})
+                return
+            print(f"⚠️ {e}, falling back to fast search")
+            fast = run_fast_search(user_query, query_embedding, filters, embed=False)
+            for position, product in enumerate(fast["results"], start=1):
+                yield product_event(position, product["name"], f"{product['price']} UAH", product["description"])
+            yield sse_event("done", {"mode": "fast", "count": len(fast["results"])})
+            return
+
+        result = "\n".join(lines) or "No matching products."
+        cache_result(generation, cache_key, None if filters else query_embedding, result)
+        yield sse_event("done", {"mode": "llm", "count": len(lines)})
 
     except Exception as e:
         traceback.print_exc()
-        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+        yield sse_event("error", {"error": f"Internal server error: {str(e)}"})
+
+
+@ai_search_bp.route("/search/stream", methods=["GET", "POST"])
+def search_stream():
+
+    """
+    Stream search results as Server-Sent Events; 'query' and the optional 'min_price',
+    'max_price', 'seller_id' filters in the JSON body or the query string.
+    """
+
+    data = {**request.args.to_dict(), **(request.get_json(silent=True) or {})}
+    user_query = (data.get("query") or "").strip()
+
+    if not user_query:
+        return jsonify({"error": "Query is required"}), 400
+
+    try:
+        filters = SearchFiltersSchema(**data).model_dump(exclude_none=True)
+    except ValidationError as e:
+        return jsonify({"errors": e.errors()}), 400
+
+    return Response(
+        stream_with_context(stream_search_events(user_query, filters)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
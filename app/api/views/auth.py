@@ -30,6 +30,10 @@ def register():
     user, error = register_user(data)
     if error == "Email or nickname already exists":
         return jsonify({"error": error}), 409
+    elif error == "Authentication is busy":
+        response = jsonify({"error": error})
+        response.headers["Retry-After"] = str(user["retry_after"])
+        return response, 503
     elif error:
         return jsonify({"error": "Registration failed", "details": error}), 500
 
@@ -50,6 +54,10 @@ def login():
     result, error = login_user(data)
     if error == "Invalid credentials":
         return jsonify({"error": error}), 401
+    elif error in ("Too many login attempts", "Authentication is busy"):
+        response = jsonify({"error": error})
+        response.headers["Retry-After"] = str(result["retry_after"])
+        return response, 429 if error == "Too many login attempts" else 503
     elif error:
         return jsonify({"error": "Login failed", "details": error}), 500
 
@@ -3,10 +3,17 @@ from sqlalchemy import text
 from datetime import datetime
 from flasgger import swag_from
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
+from prometheus_client import CONTENT_TYPE_LATEST
 
-from api.views.utils import jwt_required
-from api.views.services.manage_service import check_database_connection, create_random_products, get_all_users_service
+from api.views.utils import jwt_required, json_response
+from metrics.instrumentation import render_metrics
+from api.views.services.manage_service import (
+    check_dependencies,
+    get_all_users_service,
+    create_random_products,
+    check_database_connection,
+)
 
 
 manage_bp = Blueprint("manage", __name__, url_prefix="/manage")
@@ -16,12 +23,12 @@ manage_bp = Blueprint("manage", __name__, url_prefix="/manage")
 @swag_from("swagger/manage/health_check.yaml")
 def health_check():
 
-    """Check database connection health; no input required."""
+    """Check database connection health and report Chroma/Ollama availability; no input required."""
 
     result, error = check_database_connection()
     if error:
-        return jsonify({"status": "error", "message": error}), 500
-    return jsonify(result), 200
+        return jsonify({"status": "error", "message": error, "dependencies": check_dependencies()}), 500
+    return jsonify({**result, "dependencies": check_dependencies()}), 200
 
 
 @manage_bp.route("/populate/products", methods=["POST"])
@@ -46,4 +53,13 @@ def get_all_users():
     users_list, error = get_all_users_service()
     if error:
         return jsonify({"error": "Failed to fetch users", "details": error}), 500
-    return jsonify({"users": users_list}), 200
+    return json_response({"users": users_list})
+
+
+@manage_bp.route("/metrics", methods=["GET"])
+@swag_from("swagger/manage/metrics.yaml")
+def metrics():
+
+    """Expose request, SQL, Chroma/Ollama and consumer fan-out metrics in Prometheus text format; no input required."""
+
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
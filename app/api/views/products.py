@@ -4,23 +4,24 @@ from pydantic import ValidationError
 from flask import Blueprint, request, jsonify
 
 from api.schemas.products_schemas import (
-    ProductsListSchema,
+    ProductsQuerySchema,
+    SimilarProductsQuerySchema,
     ProductCreateSchema,
     ProductUpdateSchema,
-    ProductDetailSchema, 
-    ProductSummarySchema,
     ProductResponseSchema,
 )
 from api.views.services.products_service import (
-    get_product_by_id,
     delete_product_service,
     create_product_service,
     update_product_service,
+    get_product_validators,
+    get_product_detail_data,
     purchase_product_service,
-    get_all_available_products,
+    get_products_page_validators,
+    get_available_products_page_data,
 )
-from api.views.utils import jwt_required
-from events.producers.products_producer import send_new_product_event
+from api.views.services.search_service import get_similar_products_data
+from api.views.utils import jwt_required, json_response, not_modified, with_validators
 
 product_bp = Blueprint("product", __name__, url_prefix="/products")
 
@@ -50,11 +51,27 @@ def create_product(user_id):
 @swag_from("swagger/products/get_all_products.yaml")
 def get_all_products():
 
-    """Get a list of all available (unsold) products; no input required."""
+    """Get a page of available (unsold) products; optional 'limit', 'cursor', 'min_price', 'max_price', 'seller_id' query params."""
 
-    products = get_all_available_products()
-    products_data = [ProductSummarySchema.from_orm(p) for p in products]
-    return jsonify(ProductsListSchema(products=products_data).dict()), 200
+    try:
+        params = ProductsQuerySchema(**request.args.to_dict())
+    except ValidationError as e:
+        return jsonify({"errors": e.errors()}), 400
+
+    validators = get_products_page_validators()
+    if validators:
+        response = not_modified(*validators)
+        if response:
+            return response
+
+    page_data, error = get_available_products_page_data(params)
+    if error == "Invalid cursor":
+        return jsonify({"error": error}), 400
+    elif error:
+        return jsonify({"error": "Failed to fetch products", "details": error}), 500
+
+    response = json_response(page_data)
+    return with_validators(response, *validators) if validators else response
 
 
 @product_bp.route("/<int:product_id>", methods=["GET"])
@@ -63,11 +80,37 @@ def get_product_detail(product_id):
 
     """Get detailed info of a product by ID; product_id in URL path."""
 
-    product = get_product_by_id(product_id)
-    if not product:
+    validators = get_product_validators(product_id)
+    if validators:
+        response = not_modified(*validators)
+        if response:
+            return response
+
+    product_data, validators = get_product_detail_data(product_id)
+    if not product_data:
         return jsonify({"error": "Product not found"}), 404
 
-    return jsonify(ProductDetailSchema.from_orm(product).dict()), 200
+    return with_validators(jsonify(product_data), *validators)
+
+
+@product_bp.route("/<int:product_id>/similar", methods=["GET"])
+@swag_from("swagger/products/get_similar_products.yaml")
+def get_similar_products(product_id):
+
+    """Get unsold products similar to a product; optional 'limit', 'min_price', 'max_price' query params."""
+
+    try:
+        params = SimilarProductsQuerySchema(**request.args.to_dict())
+    except ValidationError as e:
+        return jsonify({"errors": e.errors()}), 400
+
+    data, error = get_similar_products_data(product_id, params)
+    if error == "Product not found":
+        return jsonify({"error": error}), 404
+    elif error:
+        return jsonify({"error": "Failed to fetch similar products", "details": error}), 503
+
+    return jsonify(data), 200
 
 
 @product_bp.route("/<int:product_id>", methods=["PATCH"])
@@ -2,8 +2,8 @@ from flasgger import swag_from
 
 from flask import Blueprint, jsonify
 
-from api.views.utils import jwt_required
-from api.views.services.profile_service import get_user_profile_with_products
+from api.views.utils import jwt_required, json_response, not_modified, with_validators
+from api.views.services.profile_service import get_profile_etag, get_user_profile_with_products
 
 profile_bp = Blueprint("profile", __name__, url_prefix="/profile")
 
@@ -15,6 +15,12 @@ def get_profile(user_id):
 
     """Retrieve authenticated user's profile along with their products; no input required."""
 
+    etag = get_profile_etag(user_id)
+    if etag:
+        response = not_modified(etag, private=True)
+        if response:
+            return response
+
     profile_data, error = get_user_profile_with_products(user_id)
 
     if error == "User not found":
@@ -22,4 +28,5 @@ def get_profile(user_id):
     elif error:
         return jsonify({"error": "Unknown error", "details": error}), 500
 
-    return jsonify(profile_data.dict()), 200
+    response = json_response(profile_data)
+    return with_validators(response, etag, private=True) if etag else response
@@ -2,6 +2,8 @@ from jwt import ExpiredSignatureError, InvalidTokenError
 
 from db.models import User
 from db.extensions import db
+from cache.auth_cache import register_login_attempt, clear_login_attempts
+from api.views.services.password_hasher import HashingRejected, needs_rehash
 
 from api.views.utils import (
     hash_password,
@@ -18,10 +20,15 @@ def register_user(data):
     if User.query.filter((User.email == data.email) | (User.nickname == data.nickname)).first():
         return None, "Email or nickname already exists"
 
+    try:
+        password_hash = hash_password(data.password)
+    except HashingRejected as e:
+        return {"retry_after": e.retry_after}, "Authentication is busy"
+
     user = User(
         nickname=data.nickname,
         email=data.email,
-        password_hash=hash_password(data.password)
+        password_hash=password_hash
     )
 
     try:
@@ -35,14 +42,28 @@ def register_user(data):
 
 def login_user(data):
 
-    """Authenticate user and generate access and refresh tokens."""
+    """
+    Authenticate user and generate access and refresh tokens. Attempts are rate limited
+    per account, and a hash made with outdated parameters is replaced on success.
+    """
+
+    retry_after = register_login_attempt(data.nickname_or_email)
+    if retry_after:
+        return {"retry_after": retry_after}, "Too many login attempts"
 
     user = User.query.filter(
         (User.email == data.nickname_or_email) | (User.nickname == data.nickname_or_email)
     ).first()
 
-    if not user or not verify_password(data.password, user.password_hash):
-        return None, "Invalid credentials"
+    try:
+        if not user or not verify_password(data.password, user.password_hash):
+            return None, "Invalid credentials"
+    except HashingRejected as e:
+        return {"retry_after": e.retry_after}, "Authentication is busy"
+
+    clear_login_attempts(data.nickname_or_email)
+    if needs_rehash(user.password_hash):
+        rehash_password(user, data.password)
 
     access_token, refresh_token = create_tokens(user.id)
     return {
@@ -52,6 +73,20 @@ def login_user(data):
     }, None
 
 
+def rehash_password(user, password: str):
+
+    """Store a hash with the current parameters; best-effort, the old hash stays valid on failure."""
+
+    try:
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    except HashingRejected:
+        pass
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Could not upgrade password hash for user {user.id}: {e}")
+
+
 def refresh_user_token(refresh_token):
 
     """Validate a refresh token and return a new access token."""
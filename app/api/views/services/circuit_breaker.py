@@ -0,0 +1,88 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from contextlib import contextmanager
+
+from metrics.instrumentation import observe_dependency_call
+
+load_dotenv()
+
+circuit_failure_threshold = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+circuit_reset_timeout = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+
+
+class ServiceUnavailable(Exception):
+
+    """Raised when an external service failed or its circuit is open."""
+
+
+class CircuitBreaker:
+
+    """
+    Stops calling a failing service for a while. After failure_threshold consecutive
+    failures the circuit opens and calls fail fast with ServiceUnavailable; once
+    reset_timeout seconds have passed calls are let through again, and the first
+    failure reopens the circuit while the first success closes it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = circuit_failure_threshold,
+        reset_timeout: float = circuit_reset_timeout,
+        failures=(Exception,),
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = failures
+        self._lock = threading.Lock()
+        self._failure_count = 0
+        self._opened_at = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def record_success(self):
+        with self._lock:
+            self._failure_count = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failure_count += 1
+            if self._opened_at is not None or self._failure_count >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self, operation: str = "call"):
+
+        """
+        Run the block against the service; failures are counted and re-raised as ServiceUnavailable.
+        The block's duration is recorded per operation, with calls refused by an open circuit as "rejected".
+        """
+
+        if self.state == "open":
+            observe_dependency_call(self.name.lower(), operation, "rejected", 0.0)
+            raise ServiceUnavailable(f"{self.name} is unavailable (circuit open)")
+
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        except ServiceUnavailable:
+            raise
+        except self.failures as e:
+            self.record_failure()
+            raise ServiceUnavailable(f"{self.name} is unavailable: {e}") from e
+        finally:
+            observe_dependency_call(self.name.lower(), operation, outcome, time.perf_counter() - started)
+        self.record_success()
@@ -0,0 +1,185 @@
+import os
+import time
+import uuid
+import threading
+import redis
+import requests
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from cache.search_cache import redis_client
+from api.views.services.circuit_breaker import CircuitBreaker
+
+load_dotenv()
+
+ollama_api = os.getenv("OLLAMA_API", "http://ollama:11434/api/chat")
+ollama_timeout = float(os.getenv("OLLAMA_TIMEOUT", 60))
+ollama_max_concurrency = int(os.getenv("OLLAMA_MAX_CONCURRENCY", 2))
+ollama_queue_size = int(os.getenv("OLLAMA_QUEUE_SIZE", 8))
+ollama_queue_timeout = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", 10))
+# Generations allowed at once across every worker; 0 keeps the limit per process only.
+ollama_global_concurrency = int(os.getenv("OLLAMA_GLOBAL_CONCURRENCY", 0))
+
+global_slots_key = "ai_search:ollama:slots"
+global_poll_interval = 0.05
+
+# Drops expired leases, then takes a slot if fewer than the limit are held.
+acquire_global_slot_script = redis_client.register_script("""
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    return 1
+end
+return 0
+""")
+
+
+class GenerationRejected(Exception):
+
+    """Raised when a generation cannot be admitted in time; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _InFlight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GenerationGate:
+
+    """
+    Per-process admission control in front of the LLM. Identical in-flight generations are
+    merged into one, at most max_concurrent run at once, up to max_queue callers wait for a
+    slot until their deadline and any further caller is rejected immediately. With a
+    global_limit the slots are also leased from Redis, capping generations across workers.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        global_limit: int = 0,
+        lease_seconds: float = 120,
+    ):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.global_limit = global_limit
+        self.lease_seconds = lease_seconds
+        self.retry_after = max(1, int(queue_timeout))
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = {}
+
+    def _acquire_local(self, deadline: float):
+        if self._slots.acquire(blocking=False):
+            return
+
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise GenerationRejected("Search is busy, try again later", self.retry_after)
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        if not acquired:
+            raise GenerationRejected("Timed out waiting for a free search slot", self.retry_after)
+
+    def _acquire_global(self, deadline: float):
+
+        """Lease a cluster-wide slot; returns its token, or None when Redis coordination is off or unavailable."""
+
+        if not self.global_limit:
+            return None
+
+        token = uuid.uuid4().hex
+        while True:
+            now = time.time()
+            try:
+                if acquire_global_slot_script(
+                    keys=[global_slots_key],
+                    args=[now, now + self.lease_seconds, self.global_limit, token],
+                ):
+                    return token
+            except redis.RedisError:
+                return None
+            if time.monotonic() >= deadline:
+                raise GenerationRejected("Timed out waiting for a free search slot", self.retry_after)
+            time.sleep(global_poll_interval)
+
+    def _release_global(self, token):
+        if token is None:
+            return
+        try:
+            redis_client.zrem(global_slots_key, token)
+        except redis.RedisError:
+            pass
+
+    @contextmanager
+    def slot(self):
+
+        """Hold one generation slot for the duration of the block, queueing until the deadline."""
+
+        deadline = time.monotonic() + self.queue_timeout
+        self._acquire_local(deadline)
+        try:
+            token = self._acquire_global(deadline)
+            try:
+                yield
+            finally:
+                self._release_global(token)
+        finally:
+            self._slots.release()
+
+    def run(self, key: str, generate):
+
+        """
+        Return generate() for the given key. If the same key is already being generated
+        the caller waits for that result (or its error) instead of starting another one.
+        """
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with self.slot():
+                flight.result = generate()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+        return flight.result
+
+
+generation_gate = GenerationGate(
+    max_concurrent=ollama_max_concurrency,
+    max_queue=ollama_queue_size,
+    queue_timeout=ollama_queue_timeout,
+    global_limit=ollama_global_concurrency,
+    lease_seconds=ollama_timeout + ollama_queue_timeout,
+)
+
+# LLM calls go through this breaker; while it is open searches fall back to fast mode at once.
+ollama_breaker = CircuitBreaker("Ollama", failures=(requests.RequestException,))
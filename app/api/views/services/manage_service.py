@@ -1,9 +1,15 @@
+import json
 import random
 from sqlalchemy import text
 from datetime import datetime
 
 from db.extensions import db
-from db.models import Product, User
+from db.models import OutboxEvent, Product, User
+from cache.products_cache import invalidate_catalog
+from chroma.collections import chroma_breaker
+from api.views.services.generation_gate import ollama_breaker
+from api.views.utils import rows_to_dicts
+from events.producers.products_producer import product_event_payload
 
 SECTORS = {
     'Electronics': ['Smartphone', 'Laptop', 'Headphones', 'Smartwatch', 'Tablet'],
@@ -28,6 +34,18 @@ def check_database_connection():
         return None, str(e)
 
 
+def check_dependencies():
+
+    """
+    Report the search backends from this worker's circuit breakers instead of calling them,
+    so probes add no latency and never count towards opening a circuit. The backends are
+    optional, so their state never fails the health check.
+    """
+
+    states = {"closed": "ok", "half-open": "recovering (circuit half-open)", "open": "unavailable (circuit open)"}
+    return {breaker.name.lower(): states[breaker.state] for breaker in (chroma_breaker, ollama_breaker)}
+
+
 def create_random_products(user_id: int):
 
     """Generate and insert 50 random products for the given user."""
@@ -54,8 +72,15 @@ def create_random_products(user_id: int):
             ))
 
     try:
-        db.session.bulk_save_objects(products_to_create)
+        db.session.add_all(products_to_create)
+        db.session.flush()
+        # 'imported' events reach the search indexer but do not notify subscribers.
+        db.session.add_all([
+            OutboxEvent(payload=json.dumps(product_event_payload(product, "imported")))
+            for product in products_to_create
+        ])
         db.session.commit()
+        invalidate_catalog()
         return len(products_to_create), None
     except Exception as e:
         db.session.rollback()
@@ -65,14 +90,7 @@ def create_random_products(user_id: int):
 def get_all_users_service():
 
     try:
-        users = User.query.all()
-        users_list = [
-            {
-                "id": user.id,
-                "nickname": user.nickname,
-            }
-            for user in users
-        ]
-        return users_list, None
+        users = db.session.query(User.id, User.nickname).all()
+        return rows_to_dicts(users, ("id", "nickname")), None
     except Exception as e:
         return None, str(e)
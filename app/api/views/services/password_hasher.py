@@ -0,0 +1,104 @@
+import os
+import threading
+import multiprocessing
+from dotenv import load_dotenv
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+load_dotenv()
+
+# Full werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:1000000"; stored
+# hashes with a different prefix are upgraded on the next successful login.
+password_hash_method = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+password_hash_workers = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+password_hash_queue_size = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 16))
+password_hash_timeout = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+
+class HashingRejected(Exception):
+
+    """Raised when a hash cannot be computed in time; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+
+    """
+    Runs password hashing in a small pool of worker processes so it never holds a request
+    thread's CPU or the GIL. At most workers + max_queue hashes are pending per process;
+    callers beyond that are rejected immediately and queued callers give up after timeout.
+    The pool is started lazily and again after a fork, so preloaded parents never own one.
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_after = max(1, int(timeout))
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Spawned workers start clean instead of inheriting the app's threads and sockets.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingRejected("Authentication is busy, try again later", self.retry_after)
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except (BrokenProcessPool, RuntimeError):
+            self._slots.release()
+            self._reset(executor)
+            raise HashingRejected("Authentication is busy, try again later", self.retry_after)
+
+        # The slot is held until the worker is really done, even if the caller gave up.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingRejected("Timed out waiting for password hashing", self.retry_after)
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise HashingRejected("Authentication is busy, try again later", self.retry_after)
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, password_hash_method)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(check_password_hash, hashed, password)
+
+
+def needs_rehash(hashed: str) -> bool:
+
+    """Whether a stored hash was made with other parameters than password_hash_method."""
+
+    return hashed.split("$", 1)[0] != password_hash_method
+
+
+password_hasher = PasswordHasher(
+    workers=password_hash_workers,
+    max_queue=password_hash_queue_size,
+    timeout=password_hash_timeout,
+)
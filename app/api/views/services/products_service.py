@@ -1,11 +1,43 @@
+import json
+import time
+import base64
+from datetime import datetime
+
 from db.extensions import db
-from db.models import Product, User
-from events.producers.products_producer import send_new_product_event
+from db.models import OutboxEvent, Product, User
+from api.views.utils import rows_to_dicts
+from api.schemas.products_schemas import ProductDetailSchema
+from cache.products_cache import (
+    cache_listing,
+    cache_product,
+    get_cached_listing,
+    get_cached_product,
+    get_catalog_state,
+    get_catalog_version,
+    get_product_cache_token,
+    invalidate_catalog,
+    invalidate_product,
+)
+from api.views.services.wallet_service import (
+    lock_wallet,
+    to_minor_units,
+    add_wallet_entry,
+    get_wallet_balance,
+    use_read_committed,
+)
+from events.producers.products_producer import product_event_payload
+
+
+def _queue_product_event(payload):
+
+    """Stage a product event in the outbox; it is committed with the caller's transaction."""
+
+    db.session.add(OutboxEvent(payload=json.dumps(payload)))
 
 
 def create_product_service(user_id, data):
 
-    """Create a new product for the specified seller."""
+    """Create a new product for the specified seller and queue its event in the outbox."""
 
     seller = User.query.get(user_id)
     if not seller:
@@ -19,19 +51,113 @@ def create_product_service(user_id, data):
     )
     try:
         db.session.add(product)
+        db.session.flush()
+        _queue_product_event(product_event_payload(product))
         db.session.commit()
-        send_new_product_event(product)
+        invalidate_catalog()
         return product, None
     except Exception as e:
         db.session.rollback()
         return None, str(e)
 
 
-def get_all_available_products():
+# Fields of ProductSummarySchema, selected as plain columns for listings.
+product_summary_fields = ("id", "name", "price")
+
+
+def _encode_cursor(product):
+
+    """Encode the (created_at, id) keyset position of a product row as an opaque cursor."""
+
+    raw = json.dumps([product.created_at.isoformat(), product.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+
+    """Decode a cursor back into a (created_at, id) pair; raises ValueError if malformed."""
+
+    try:
+        created_at, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(product_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def get_available_products_page(limit, cursor=None, min_price=None, max_price=None, seller_id=None):
+
+    """
+    Retrieve one page of unsold products, newest first, using keyset pagination
+    on (created_at, id) so every page costs the same regardless of catalog size.
+    Only the summary columns are selected; products are (id, name, price, created_at) rows.
+    Returns ({"products": [...], "next_cursor": str | None}, error).
+    """
+
+    query = (
+        db.session.query(Product.id, Product.name, Product.price, Product.created_at)
+        .filter(Product.is_sold == False)
+    )
+
+    if seller_id is not None:
+        query = query.filter(Product.seller_id == seller_id)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+
+    if cursor:
+        try:
+            created_at, product_id = _decode_cursor(cursor)
+        except ValueError as e:
+            return None, str(e)
+        query = query.filter(
+            (Product.created_at < created_at)
+            | ((Product.created_at == created_at) & (Product.id < product_id))
+        )
+
+    products = (
+        query
+        .order_by(Product.created_at.desc(), Product.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        next_cursor = _encode_cursor(products[-1])
+
+    return {"products": products, "next_cursor": next_cursor}, None
+
 
-    """Retrieve all unsold products, is_sold=False."""
+def get_available_products_page_data(params):
 
-    return Product.query.filter_by(is_sold=False).all()
+    """Return a serialized page of unsold products, read through the Redis listing cache."""
+
+    catalog_version = get_catalog_version()
+    cache_params = params.dict()
+
+    data = get_cached_listing(catalog_version, cache_params)
+    if data is not None:
+        return data, None
+
+    page, error = get_available_products_page(
+        limit=params.limit,
+        cursor=params.cursor,
+        min_price=params.min_price,
+        max_price=params.max_price,
+        seller_id=params.seller_id,
+    )
+    if error:
+        return None, error
+
+    # Rows come straight from typed columns, so they are not re-validated per product.
+    data = {
+        "products": rows_to_dicts(page["products"], product_summary_fields),
+        "next_cursor": page["next_cursor"],
+    }
+    cache_listing(catalog_version, cache_params, data)
+    return data, None
 
 
 def get_product_by_id(product_id):
@@ -39,6 +165,67 @@ def get_product_by_id(product_id):
     return Product.query.get(product_id)
 
 
+def get_products_page_validators():
+
+    """(etag, last_modified) shared by every listing page, from the catalog version; None if unknown."""
+
+    state = get_catalog_state()
+    if state is None:
+        return None
+
+    version, modified_at = state
+    last_modified = datetime.utcfromtimestamp(modified_at) if modified_at else None
+    return f"catalog-{version}", last_modified
+
+
+def product_etag(product_id, version: int) -> str:
+    return f"product-{product_id}-{version}"
+
+
+def get_product_validators(product_id):
+
+    """
+    Return (etag, updated_at) of a product without loading it: from its cached detail when
+    present, otherwise from a two-column lookup. None if the product is missing.
+    """
+
+    cached = get_cached_product(product_id)
+    if cached is not None:
+        updated_at = datetime.fromisoformat(cached["updated_at"]) if cached["updated_at"] else None
+        return product_etag(product_id, cached["version"]), updated_at
+
+    row = db.session.query(Product.version, Product.updated_at).filter(Product.id == product_id).first()
+    if not row:
+        return None
+    return product_etag(product_id, row.version), row.updated_at
+
+
+def get_product_detail_data(product_id):
+
+    """
+    Return (serialized detail, (etag, updated_at)) of a product, read through the Redis cache;
+    (None, None) if missing. Both come from the same row, so they always agree.
+    """
+
+    cached = get_cached_product(product_id)
+    if cached is not None:
+        updated_at = datetime.fromisoformat(cached["updated_at"]) if cached["updated_at"] else None
+        return cached["detail"], (product_etag(product_id, cached["version"]), updated_at)
+
+    token = get_product_cache_token(product_id)
+    product = get_product_by_id(product_id)
+    if not product:
+        return None, None
+
+    data = ProductDetailSchema.from_orm(product).dict()
+    cache_product(product_id, {
+        "detail": data,
+        "version": product.version,
+        "updated_at": product.updated_at.isoformat() if product.updated_at else None,
+    }, token)
+    return data, (product_etag(product_id, product.version), product.updated_at)
+
+
 def update_product_service(product_id, user_id, data):
 
     """Update a product's details if user is the seller."""
@@ -55,9 +242,12 @@ def update_product_service(product_id, user_id, data):
         product.price = data.price
     if data.description is not None:
         product.description = data.description
+    product.version = Product.version + 1
 
     try:
+        _queue_product_event(product_event_payload(product, "updated"))
         db.session.commit()
+        invalidate_product(product_id)
         return product, None
     except Exception as e:
         db.session.rollback()
@@ -76,42 +266,104 @@ def delete_product_service(product_id, user_id):
         return "Forbidden", 403
 
     try:
+        _queue_product_event(product_event_payload(product, "deleted"))
         db.session.delete(product)
         db.session.commit()
+        invalidate_product(product_id)
         return None, 200
     except Exception as e:
         db.session.rollback()
         return str(e), 500
 
 
-def purchase_product_service(product_id, user_id):
+class _PurchaseConflict(Exception):
 
-    """Handle product purchase transaction between buyer and seller."""
+    """Raised when the product row changed between the read and the conditional update."""
 
-    buyer = User.query.get(user_id)
-    if not buyer:
-        return "Buyer not found", 404
 
-    product = Product.query.get(product_id)
-    if not product or product.is_sold:
+def _is_retryable_error(error):
+
+    """
+    True for MySQL lock wait timeout (1205), deadlock (1213) and duplicate key (1062),
+    the last one raised when two purchases race to create the same wallet snapshot row.
+    """
+
+    return getattr(getattr(error, "orig", None), "errno", None) in (1062, 1205, 1213)
+
+
+def _purchase_product_once(product_id, user_id):
+
+    """
+    Run one purchase attempt as a single short transaction:
+    flip is_sold with a conditional UPDATE, lock the buyer's wallet snapshot row,
+    check the ledger balance and append the debit and credit entries.
+    The seller's wallet is never locked, so hot sellers take concurrent sales freely.
+    """
+
+    use_read_committed()
+
+    row = (
+        db.session.query(Product.seller_id, Product.is_sold)
+        .filter(Product.id == product_id)
+        .first()
+    )
+    if not row or row.is_sold:
         return "Product not available", 404
 
-    if product.seller_id == user_id:
+    if row.seller_id == user_id:
         return "Cannot buy your own product", 400
 
-    if buyer.wallet < product.price:
-        return "Insufficient funds", 400
+    if not db.session.query(User.id).filter(User.id == user_id).first():
+        return "Buyer not found", 404
 
-    seller = User.query.get(product.seller_id)
-    if not seller:
-        return "Seller not found", 404
+    # is_sold alone makes the claim atomic; comparing the FLOAT price here would never match in MySQL.
+    claimed = (
+        Product.query
+        .filter(Product.id == product_id, Product.is_sold == False)
+        .update({Product.is_sold: True, Product.version: Product.version + 1}, synchronize_session=False)
+    )
+    if not claimed:
+        db.session.rollback()
+        raise _PurchaseConflict()
 
-    try:
-        buyer.wallet -= product.price
-        seller.wallet += product.price
-        product.is_sold = True
-        db.session.commit()
-        return None, 200
-    except Exception as e:
+    # The claim holds the row lock, so the price and seller read now cannot change before commit.
+    price, seller_id = (
+        db.session.query(Product.price, Product.seller_id)
+        .filter(Product.id == product_id)
+        .one()
+    )
+
+    price_minor = to_minor_units(price)
+    lock_wallet(user_id)
+    if get_wallet_balance(user_id) < price_minor:
         db.session.rollback()
-        return str(e), 500
+        return "Insufficient funds", 400
+
+    add_wallet_entry(user_id, -price_minor, "purchase", product_id)
+    add_wallet_entry(seller_id, price_minor, "sale", product_id)
+    _queue_product_event({"event": "sold", "id": product_id, "seller_id": seller_id})
+    db.session.commit()
+    return None, 200
+
+
+def purchase_product_service(product_id, user_id, max_attempts=3):
+
+    """Handle product purchase transaction between buyer and seller, retrying on deadlocks."""
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            error, status = _purchase_product_once(product_id, user_id)
+        except _PurchaseConflict:
+            if attempt == max_attempts:
+                return "Product not available", 404
+            continue
+        except Exception as e:
+            db.session.rollback()
+            if _is_retryable_error(e) and attempt < max_attempts:
+                time.sleep(0.01 * 2 ** attempt)
+                continue
+            return str(e), 500
+
+        if status == 200:
+            invalidate_product(product_id)
+        return error, status
@@ -1,29 +1,78 @@
-from db.models import User, Product, Subscription
-from api.schemas.profile_schemas import UserProfileWithProductsSchema
+import hashlib
+from sqlalchemy import func
+
+from db.extensions import db
+from db.models import User, Product, Subscription, WalletEntry
+from api.views.utils import rows_to_dicts
+from api.views.services.wallet_service import get_wallet_balance, from_minor_units
+
+# Fields of the profile schemas, selected as plain columns instead of loading ORM objects.
+profile_product_fields = ("id", "name", "price", "is_sold")
+profile_subscription_fields = ("id", "nickname", "email")
 
 
 def get_user_profile_with_products(user_id: int):
 
-    user = User.query.get(user_id)
+    """Return the profile payload of a user, shaped like UserProfileWithProductsSchema."""
+
+    user = (
+        db.session.query(User.id, User.nickname, User.email)
+        .filter(User.id == user_id)
+        .first()
+    )
     if not user:
         return None, "User not found"
 
-    products = Product.query.filter_by(seller_id=user.id).all()
+    products = (
+        db.session.query(Product.id, Product.name, Product.price, Product.is_sold)
+        .filter(Product.seller_id == user.id)
+        .all()
+    )
 
     subscriptions = (
-        User.query
+        db.session.query(User.id, User.nickname, User.email)
         .join(Subscription, Subscription.seller_id == User.id)
         .filter(Subscription.subscriber_id == user.id)
         .all()
     )
 
-    profile_data = UserProfileWithProductsSchema(
-        id=user.id,
-        nickname=user.nickname,
-        email=user.email,
-        wallet=user.wallet,
-        active_products=products,
-        subscriptions=subscriptions,
-    )
+    profile_data = {
+        "id": user.id,
+        "nickname": user.nickname,
+        "email": user.email,
+        "wallet": from_minor_units(get_wallet_balance(user.id)),
+        "active_products": rows_to_dicts(products, profile_product_fields),
+        "subscriptions": rows_to_dicts(subscriptions, profile_subscription_fields),
+    }
 
     return profile_data, None
+
+
+def get_profile_etag(user_id: int):
+
+    """
+    Fingerprint everything the profile shows with one row of aggregates:
+    the seller's product count, newest id and version sum, the newest wallet entry and the
+    subscription count and newest id. Returns None if the user is missing.
+    """
+
+    row = (
+        db.session.query(
+            User.nickname,
+            User.email,
+            User.wallet,
+            db.session.query(func.count(Product.id)).filter(Product.seller_id == User.id).scalar_subquery(),
+            db.session.query(func.max(Product.id)).filter(Product.seller_id == User.id).scalar_subquery(),
+            db.session.query(func.sum(Product.version)).filter(Product.seller_id == User.id).scalar_subquery(),
+            db.session.query(func.max(WalletEntry.id)).filter(WalletEntry.user_id == User.id).scalar_subquery(),
+            db.session.query(func.count(Subscription.id)).filter(Subscription.subscriber_id == User.id).scalar_subquery(),
+            db.session.query(func.max(Subscription.id)).filter(Subscription.subscriber_id == User.id).scalar_subquery(),
+        )
+        .filter(User.id == user_id)
+        .first()
+    )
+    if not row:
+        return None
+
+    digest = hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:20]
+    return f"profile-{user_id}-{digest}"
@@ -0,0 +1,315 @@
+import os
+import re
+import math
+import time
+import threading
+import numpy as np
+from typing import Optional
+from collections import Counter, defaultdict
+
+from db.extensions import db
+from db.models import Product
+from chroma.collections import chroma_breaker, has_sold_metadata, get_active_collection
+from cache.search_cache import get_index_generation
+from cache.products_cache import cache_similar, get_cached_similar
+
+bm25_refresh_interval = int(os.getenv("BM25_REFRESH_INTERVAL", 300))
+rrf_k = 60
+token_pattern = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return token_pattern.findall((text or "").lower())
+
+
+class BM25Index:
+
+    """In-memory inverted index over unsold products, scored with Okapi BM25."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.names = []
+        self.prices = []
+        self.descriptions = []
+        self.seller_ids = []
+        self.postings = {}
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.avg_doc_length = 0.0
+
+    @classmethod
+    def build(cls, rows, **kwargs) -> "BM25Index":
+
+        """Build the index from (id, name, description, price, seller_id) rows."""
+
+        index = cls(**kwargs)
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = []
+
+        for doc_index, (product_id, name, description, price, seller_id) in enumerate(rows):
+            tokens = tokenize(f"{name} {description}")
+            for term, frequency in Counter(tokens).items():
+                postings[term][0].append(doc_index)
+                postings[term][1].append(frequency)
+            doc_lengths.append(len(tokens))
+            index.ids.append(product_id)
+            index.names.append(name)
+            index.prices.append(price)
+            index.descriptions.append(description or "")
+            index.seller_ids.append(seller_id)
+
+        index.postings = {
+            term: (np.asarray(docs, dtype=np.int32), np.asarray(freqs, dtype=np.float32))
+            for term, (docs, freqs) in postings.items()
+        }
+        index.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        index.avg_doc_length = float(index.doc_lengths.mean()) if doc_lengths else 0.0
+        return index
+
+    def search(self, query: str, limit: int) -> list[tuple[int, float]]:
+
+        """Return up to limit (doc_index, score) pairs with a positive score, best first."""
+
+        total = len(self.ids)
+        if not total:
+            return []
+
+        scores = np.zeros(total, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            docs, freqs = self.postings[term]
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched])[:limit]]
+        return [(int(doc_index), float(scores[doc_index])) for doc_index in top]
+
+def matches_filters(price, seller_id, filters: dict) -> bool:
+
+    """Whether a product passes the optional price range and seller filters."""
+
+    if filters.get("min_price") is not None and price < filters["min_price"]:
+        return False
+    if filters.get("max_price") is not None and price > filters["max_price"]:
+        return False
+    if filters.get("seller_id") is not None and seller_id != filters["seller_id"]:
+        return False
+    return True
+
+
+_bm25_index = None
+_bm25_generation = None
+_bm25_built_at = 0.0
+_bm25_lock = threading.Lock()
+
+
+def _load_bm25_rows():
+    return (
+        db.session.query(Product.id, Product.name, Product.description, Product.price, Product.seller_id)
+        .filter_by(is_sold=False)
+        .yield_per(1000)
+    )
+
+
+def get_bm25_index() -> BM25Index:
+
+    """
+    Return this worker's BM25 index, rebuilding it from MySQL when the search index
+    generation changed and the current one is older than bm25_refresh_interval.
+    Only one thread rebuilds; the others keep serving the previous index meanwhile.
+    """
+
+    global _bm25_index, _bm25_generation, _bm25_built_at
+
+    generation = get_index_generation()
+    stale = (
+        _bm25_index is None
+        or (generation != _bm25_generation and time.monotonic() - _bm25_built_at > bm25_refresh_interval)
+    )
+    if not stale:
+        return _bm25_index
+
+    if not _bm25_lock.acquire(blocking=_bm25_index is None):
+        return _bm25_index
+    try:
+        if _bm25_index is None or _bm25_generation != generation:
+            _bm25_index = BM25Index.build(_load_bm25_rows())
+            _bm25_generation = generation
+            _bm25_built_at = time.monotonic()
+    finally:
+        _bm25_lock.release()
+    return _bm25_index
+
+
+def _load_current_products(product_ids) -> dict:
+
+    """Current unsold rows of the given products by id, in one IN query."""
+
+    if not product_ids:
+        return {}
+    rows = (
+        db.session.query(Product.id, Product.name, Product.description, Product.price, Product.seller_id)
+        .filter(Product.id.in_(product_ids), Product.is_sold == False)
+        .all()
+    )
+    return {row.id: row for row in rows}
+
+
+def build_where(filters: Optional[dict] = None, sold_metadata: bool = True) -> Optional[dict]:
+
+    """
+    Chroma metadata filter: unsold products only, plus the optional price range and seller.
+    Without sold_metadata (see has_sold_metadata) the is_sold condition is left out, since
+    it would match nothing; None when no condition remains.
+    """
+
+    filters = filters or {}
+    conditions = [{"is_sold": False}] if sold_metadata else []
+    if filters.get("min_price") is not None:
+        conditions.append({"price": {"$gte": float(filters["min_price"])}})
+    if filters.get("max_price") is not None:
+        conditions.append({"price": {"$lte": float(filters["max_price"])}})
+    if filters.get("seller_id") is not None:
+        conditions.append({"seller_id": int(filters["seller_id"])})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _vector_candidates(collection, query_embedding, limit: int, filters: Optional[dict] = None):
+
+    """Ids of the top unsold vector matches, best first; empty without an embedding or if Chroma is unavailable."""
+
+    if query_embedding is None:
+        return []
+
+    try:
+        with chroma_breaker.guard("hybrid_query"):
+            collection = collection or get_active_collection()
+            response = collection.query(
+                query_embeddings=[list(map(float, query_embedding))],
+                n_results=limit,
+                where=build_where(filters, has_sold_metadata(collection.name)),
+                include=["distances"],
+            )
+    except Exception as e:
+        print(f"⚠️ Vector search unavailable, using BM25 only: {e}")
+        return []
+
+    return [int(product_id) for product_id in response["ids"][0]]
+
+
+def hybrid_search(
+    query: str,
+    query_embedding,
+    collection=None,
+    limit: int = 20,
+    candidates: int = 100,
+    filters: Optional[dict] = None,
+) -> list[dict]:
+
+    """
+    Rank products by fusing the BM25 ranking with the Chroma vector ranking using
+    reciprocal rank fusion, and return structured results. No LLM is involved.
+    Optional price range and seller filters apply to both rankings; collection defaults
+    to the active one. Without query_embedding only the BM25 ranking is used.
+    """
+
+    filters = filters or {}
+
+    vector_ids = _vector_candidates(collection, query_embedding, candidates, filters)
+    index = get_bm25_index()
+    bm25_ids = [index.ids[doc_index] for doc_index, _ in index.search(query, candidates)]
+
+    # Both rankings lag the database (BM25 by up to bm25_refresh_interval), so candidates are
+    # re-read: sold or deleted products drop out, and filters and results use current values.
+    current = _load_current_products(set(vector_ids) | set(bm25_ids))
+
+    fused = defaultdict(float)
+    for ranking in (vector_ids, bm25_ids):
+        rank = 0
+        for product_id in ranking:
+            row = current.get(product_id)
+            if row is None or not matches_filters(row.price, row.seller_id, filters):
+                continue
+            fused[product_id] += 1 / (rrf_k + rank + 1)
+            rank += 1
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [
+        {
+            "id": product_id,
+            "name": current[product_id].name,
+            "price": current[product_id].price,
+            "description": current[product_id].description or "",
+            "score": round(score, 6),
+        }
+        for product_id, score in ranked
+    ]
+
+
+def find_similar_products(product_id: int, limit: int = 10, filters: Optional[dict] = None):
+
+    """
+    Nearest unsold neighbours of a product, queried with the vector already stored for it
+    in the active collection. Returns (products, error); no embedding or LLM call is made.
+    """
+
+    with chroma_breaker.guard("similar_query"):
+        collection = get_active_collection()
+        stored = collection.get(ids=[str(product_id)], include=["embeddings"])
+        if not stored["ids"]:
+            return None, "Product not found"
+
+        response = collection.query(
+            query_embeddings=[stored["embeddings"][0]],
+            n_results=limit + 1,
+            where=build_where(filters, has_sold_metadata(collection.name)),
+            include=["metadatas", "distances"],
+        )
+
+    products = []
+    for neighbour_id, metadata, distance in zip(
+        response["ids"][0], response["metadatas"][0], response["distances"][0]
+    ):
+        if int(neighbour_id) == product_id or metadata.get("is_sold"):
+            continue
+        products.append({
+            "id": int(neighbour_id),
+            "name": metadata.get("name"),
+            "price": metadata.get("price"),
+            "description": metadata.get("description"),
+            # Squared L2 between unit vectors, mapped back to cosine similarity.
+            "similarity": round(1 - distance / 2, 4),
+        })
+    return products[:limit], None
+
+
+def get_similar_products_data(product_id: int, params):
+
+    """Similar products of a product, cached per product until the search index changes."""
+
+    filters = params.model_dump(exclude={"limit"}, exclude_none=True)
+    cache_params = params.model_dump()
+    generation = get_index_generation()
+
+    data = get_cached_similar(generation, product_id, cache_params)
+    if data is not None:
+        return data, None
+
+    try:
+        products, error = find_similar_products(product_id, params.limit, filters)
+    except Exception as e:
+        return None, f"Vector index unavailable: {e}"
+    if error:
+        return None, error
+
+    data = {"product_id": product_id, "similar": products}
+    cache_similar(generation, product_id, cache_params, data)
+    return data, None
@@ -1,36 +1,167 @@
-from db.models import User
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from db.models import User, WalletEntry, WalletSnapshot
 from db.extensions import db
 
+MINOR_UNITS = 100
+
+
+def to_minor_units(amount) -> int:
+    return int(round(amount * MINOR_UNITS))
+
+
+def from_minor_units(amount: int) -> float:
+    return amount / MINOR_UNITS
+
+
+def _opening_balance(user_id: int) -> int:
+
+    """Legacy float wallet of a user, in minor units, used as the balance before any snapshot."""
+
+    wallet = db.session.query(User.wallet).filter(User.id == user_id).scalar()
+    return to_minor_units(wallet or 0)
+
+
+def _tail_sum(user_id: int, after_entry_id: int, up_to_entry_id: int = None) -> int:
+    query = db.session.query(func.coalesce(func.sum(WalletEntry.amount), 0)).filter(
+        WalletEntry.user_id == user_id,
+        WalletEntry.id > after_entry_id,
+    )
+    if up_to_entry_id is not None:
+        query = query.filter(WalletEntry.id <= up_to_entry_id)
+    return int(query.scalar())
+
+
+def get_wallet_balance(user_id: int) -> int:
+
+    """Current balance in minor units: latest snapshot plus the tail of newer ledger entries."""
+
+    snapshot = db.session.get(WalletSnapshot, user_id)
+    if snapshot:
+        return snapshot.balance + _tail_sum(user_id, snapshot.last_entry_id)
+    return _opening_balance(user_id) + _tail_sum(user_id, 0)
+
+
+def lock_wallet(user_id: int) -> WalletSnapshot:
+
+    """
+    Lock the user's snapshot row for the rest of the transaction, creating it if missing.
+    Debits serialize on this lock; credits never take it. Raises IntegrityError if a
+    concurrent transaction created the row first, the caller should retry.
+    """
+
+    snapshot = WalletSnapshot.query.filter_by(user_id=user_id).with_for_update().first()
+    if snapshot:
+        return snapshot
+
+    snapshot = WalletSnapshot(
+        user_id=user_id,
+        balance=_opening_balance(user_id),
+        last_entry_id=0,
+    )
+    db.session.add(snapshot)
+    db.session.flush()
+    return snapshot
+
+
+def use_read_committed():
+
+    """
+    Switch the current transaction to READ COMMITTED so balance reads taken after
+    lock_wallet() see every debit committed by the previous lock holder.
+    Must be called before the first statement of the transaction.
+    """
+
+    if db.engine.dialect.name == "mysql":
+        db.session.connection(execution_options={"isolation_level": "READ COMMITTED"})
+
+
+def add_wallet_entry(user_id: int, amount: int, kind: str, product_id: int = None):
+    db.session.add(WalletEntry(user_id=user_id, amount=amount, kind=kind, product_id=product_id))
+
 
 def reward_user_balance(user_id: int, amount: int = 500):
 
-    """Add a specified amount to a user's wallet balance."""
+    """Credit a specified amount to a user's wallet; insert-only, takes no lock."""
 
-    user = User.query.get(user_id)
-    if not user:
+    if not db.session.query(User.id).filter(User.id == user_id).first():
         return None, "User not found"
 
     try:
-        user.wallet += amount
+        add_wallet_entry(user_id, to_minor_units(amount), "reward")
         db.session.commit()
-        return user, None
+        return from_minor_units(get_wallet_balance(user_id)), None
     except Exception as e:
         db.session.rollback()
         return None, str(e)
 
 
-def clear_user_balance(user_id: int):
+def clear_user_balance(user_id: int, max_attempts: int = 2):
 
-    """Reset a user's wallet balance to zero."""
+    """
+    Reset a user's wallet balance to zero by booking a debit of the whole balance.
+    Retried when a concurrent request created the wallet's snapshot row first.
+    """
 
-    user = User.query.get(user_id)
-    if not user:
-        return None, "User not found"
+    for attempt in range(1, max_attempts + 1):
+        use_read_committed()
+        if not db.session.query(User.id).filter(User.id == user_id).first():
+            return None, "User not found"
 
-    try:
-        user.wallet = 0
-        db.session.commit()
-        return user, None
-    except Exception as e:
+        try:
+            lock_wallet(user_id)
+            balance = get_wallet_balance(user_id)
+            if balance:
+                add_wallet_entry(user_id, -balance, "clear")
+            db.session.commit()
+            return 0.0, None
+        except IntegrityError as e:
+            db.session.rollback()
+            if attempt == max_attempts:
+                return None, str(e)
+        except Exception as e:
+            db.session.rollback()
+            return None, str(e)
+
+
+def compact_wallet_snapshots(since_entry_id: int = 0, lag_seconds: int = 60, batch_size: int = 500):
+
+    """
+    Fold ledger entries older than lag_seconds into per-user snapshots so balance reads
+    only sum a short tail. The lag keeps entries from still-open transactions out of
+    the fold. Returns the highest entry id folded, to pass as since_entry_id next time.
+    """
+
+    cutoff = datetime.utcnow() - timedelta(seconds=lag_seconds)
+    watermark = since_entry_id
+
+    while True:
+        rows = (
+            db.session.query(WalletEntry.user_id, func.max(WalletEntry.id))
+            .filter(WalletEntry.id > watermark, WalletEntry.created_at < cutoff)
+            .group_by(WalletEntry.user_id)
+            .order_by(func.max(WalletEntry.id))
+            .limit(batch_size)
+            .all()
+        )
         db.session.rollback()
-        return None, str(e)
+        if not rows:
+            return watermark
+
+        for user_id, max_entry_id in rows:
+            try:
+                snapshot = lock_wallet(user_id)
+                if max_entry_id > snapshot.last_entry_id:
+                    snapshot.balance += _tail_sum(user_id, snapshot.last_entry_id, max_entry_id)
+                    snapshot.last_entry_id = max_entry_id
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                continue
+
+        watermark = max(watermark, rows[-1][1])
+        if len(rows) < batch_size:
+            return watermark
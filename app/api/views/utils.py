@@ -1,11 +1,14 @@
 import os
 import jwt
+import orjson
 from functools import wraps
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 
-from flask import request, jsonify
+from flask import Response, request, jsonify
+from werkzeug.http import is_resource_modified
+
+from api.views.services.password_hasher import password_hasher
 
 load_dotenv()
 secret_key = os.getenv("SECRET_KEY", None)
@@ -71,8 +74,50 @@ def validate_refresh_token(token: str):
 
 
 def hash_password(password: str) -> str:
-    return generate_password_hash(password)
+
+    """Hash a password in the hashing pool; raises HashingRejected when the pool is saturated."""
+
+    return password_hasher.hash(password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    return check_password_hash(hashed, password)
+
+    """Check a password in the hashing pool; raises HashingRejected when the pool is saturated."""
+
+    return password_hasher.verify(password, hashed)
+
+
+def rows_to_dicts(rows, fields) -> list[dict]:
+
+    """Turn selected column tuples into plain dicts keyed by fields, without building models."""
+
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def json_response(data, status: int = 200) -> Response:
+
+    """Encode read endpoint payloads with orjson; much cheaper than jsonify for large listings."""
+
+    return Response(orjson.dumps(data), status=status, mimetype="application/json")
+
+
+def with_validators(response: Response, etag: str, last_modified=None, private: bool = False) -> Response:
+
+    """Attach ETag / Last-Modified and ask clients to revalidate before reusing the response."""
+
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    return response
+
+
+def not_modified(etag: str, last_modified=None, private: bool = False):
+
+    """Return a 304 response if the request's If-None-Match / If-Modified-Since still match, else None."""
+
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), etag, last_modified, private)
@@ -15,7 +15,7 @@ def reward_user(user_id):
 
     """Rewards the authenticated user with 500 coins; no input required."""
 
-    user, error = reward_user_balance(user_id)
+    balance, error = reward_user_balance(user_id)
     if error == "User not found":
         return jsonify({"error": error}), 404
     elif error:
@@ -23,7 +23,7 @@ def reward_user(user_id):
 
     return jsonify({
         "message": "You have been rewarded with 500 coins!",
-        "new_balance": user.wallet
+        "new_balance": balance
     }), 200
 
 
@@ -34,7 +34,7 @@ def clear_money(user_id):
 
     """Resets the authenticated user's wallet balance to zero; no input required."""
 
-    user, error = clear_user_balance(user_id)
+    balance, error = clear_user_balance(user_id)
     if error == "User not found":
         return jsonify({"error": error}), 404
     elif error:
@@ -42,5 +42,5 @@ def clear_money(user_id):
 
     return jsonify({
         "message": "Your money has been reset to zero.",
-        "new_balance": user.wallet
+        "new_balance": balance
     }), 200
@@ -0,0 +1,321 @@
+"""
+Latency benchmark for POST /ai_search/search.
+
+Builds synthetic catalogs from the SECTORS table, indexes them into an in-process
+Chroma client (a temporary PersistentClient, no Chroma server needed) and answers
+LLM calls from a local stub Ollama server whose latency grows with the prompt size.
+Requests go through the real Flask view from many threads; the report shows
+p50/p95/p99 latency, throughput and how the time splits between embedding,
+retrieval, prompt build, LLM (including waits for an admission slot) and parsing.
+
+Search caches are bypassed by default and never share keys with real searches.
+Redis must be reachable; MySQL is not used, the catalog for fast mode lives in SQLite.
+
+Run from the app directory:
+    python -m benchmarks.ai_search_latency --sizes 1000,10000 --requests 200 --threads 8
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import numpy as np
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+context_line_pattern = re.compile(r"^Name: (.+?), Price: (.+?), Description: (.*)$", re.MULTILINE)
+adjectives = ["compact", "premium", "budget", "classic", "wireless", "organic", "durable", "lightweight", "vintage", "smart"]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+class HashingEmbeddingFunction:
+
+    """Deterministic bag-of-words embeddings, for runs without the ONNX model."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def __call__(self, input):
+        vectors = np.zeros((len(input), self.dim), dtype=np.float32)
+        for row, text in enumerate(input):
+            for token in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(token.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return list(vectors / np.where(norms == 0, 1.0, norms))
+
+
+def start_stub_ollama(base_latency: float, prefill_rate: float, matches: int):
+
+    """
+    Serve /api/chat on a free local port. Each call sleeps base_latency plus the prompt's
+    estimated token count divided by prefill_rate, then answers with the first matches
+    products of the prompt context in the 'Product #n' format.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = payload["messages"][-1]["content"]
+            time.sleep(base_latency + len(prompt) / 4 / prefill_rate)
+
+            products = context_line_pattern.findall(prompt)[:matches]
+            content = "\n".join(
+                f"Product #{i}: Name: {name}, Price: {price}, Description: {description}"
+                for i, (name, price, description) in enumerate(products, start=1)
+            ) or "No matching products."
+
+            body = json.dumps({"message": {"role": "assistant", "content": content}, "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def synthetic_catalog(size: int, rng: random.Random, sectors: dict):
+
+    """Yield (name, description, price) rows spread evenly over the sectors."""
+
+    items = [(sector, name) for sector, names in sectors.items() for name in names]
+    for i in range(size):
+        sector, name = items[i % len(items)]
+        adjective = rng.choice(adjectives)
+        yield (
+            f"{name} {rng.randint(1000, 9999)}",
+            f"{adjective.capitalize()} {name.lower()} from {sector.lower()} sector. "
+            f"High quality {name.lower()} for everyday use.",
+            round(rng.uniform(10, 1000), 2),
+        )
+
+
+def synthetic_queries(rng: random.Random, sectors: dict, count: int):
+    items = [(sector, name) for sector, names in sectors.items() for name in names]
+    queries = []
+    for _ in range(count):
+        sector, name = rng.choice(items)
+        queries.append(rng.choice([
+            name.lower(),
+            f"{rng.choice(adjectives)} {name.lower()}",
+            f"{name.lower()} from {sector.lower()}",
+        ]))
+    return queries
+
+
+class StageTimer:
+
+    """Wraps pipeline functions of the ai module and records how long each call takes."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def wrap(self, module, attribute: str, stage: str):
+        original = getattr(module, attribute)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.samples[stage].append(time.perf_counter() - started)
+
+        setattr(module, attribute, timed)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+
+def seed_catalog(app, db, Product, collection, embed_documents, size, rng, sectors, chunk_size=500):
+
+    """Insert the catalog into SQLite (for BM25) and index it into the Chroma collection."""
+
+    with app.app_context():
+        Product.query.delete()
+        db.session.commit()
+
+        rows = list(synthetic_catalog(size, rng, sectors))
+        for start in range(0, len(rows), chunk_size):
+            products = [
+                Product(name=name, description=description, price=price, seller_id=1, is_sold=False)
+                for name, description, price in rows[start:start + chunk_size]
+            ]
+            db.session.add_all(products)
+            db.session.flush()
+
+            documents = [f"{product.name}. {product.description}" for product in products]
+            collection.upsert(
+                ids=[str(product.id) for product in products],
+                documents=documents,
+                embeddings=embed_documents(documents),
+                metadatas=[
+                    {
+                        "name": product.name,
+                        "description": product.description,
+                        "price": float(product.price),
+                        "seller_id": 1,
+                        "is_sold": False,
+                    }
+                    for product in products
+                ],
+            )
+        db.session.commit()
+
+
+def run(args):
+
+    """Benchmark every catalog size and print the report; returns exit code."""
+
+    workdir = tempfile.mkdtemp(prefix="ai_search_bench_")
+    stub = start_stub_ollama(args.llm_latency, args.prefill_rate, args.llm_matches)
+
+    # Must be set before the app modules read their configuration at import time.
+    os.environ["CHROMADB_PATH"] = os.path.join(workdir, "chroma")
+    os.environ["EMBEDDING_STORE_DIR"] = os.path.join(workdir, "embeddings")
+    os.environ["OLLAMA_API"] = f"http://127.0.0.1:{stub.server_address[1]}/api/chat"
+
+    from flask import Flask
+    from db.extensions import db
+    from db.models import Product
+    from api.views import ai
+    from api.views.services import search_service
+    from api.views.services.manage_service import SECTORS
+    import chroma.collections as collections
+    from chroma.embedding_store import EmbeddingStore
+
+    if args.fake_embeddings:
+        collections.embedding_store = EmbeddingStore(
+            os.environ["EMBEDDING_STORE_DIR"], "hashing-bow", HashingEmbeddingFunction()
+        )
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    app.register_blueprint(ai.ai_search_bp)
+    with app.app_context():
+        db.create_all()
+
+    # Private cache generation, so benchmark answers are never served to real searches.
+    generation = f"bench-{int(time.time())}"
+    ai.get_index_generation = lambda: generation
+    if not args.cache:
+        ai.get_cached_result = lambda *a, **k: None
+        ai.get_similar_cached_result = lambda *a, **k: None
+        ai.cache_result = lambda *a, **k: None
+
+    timer = StageTimer()
+    timer.wrap(ai, "embed_query", "embed")
+    timer.wrap(ai, "retrieve_products", "retrieval")
+    timer.wrap(ai, "build_prompt", "prompt")
+    timer.wrap(ai, "generate_answer", "llm")
+    timer.wrap(ai, "parse_and_filter_products", "parse")
+    timer.wrap(ai, "hybrid_search", "hybrid")
+
+    rng = random.Random(args.seed)
+    collection_name = collections.get_active_collection_name()
+
+    for size in args.sizes:
+        try:
+            collections.get_client().delete_collection(collection_name)
+        except Exception:
+            pass
+        ai._vectorstore = None
+        search_service._bm25_index = None
+
+        started = time.perf_counter()
+        seed_catalog(
+            app, db, Product, collections.get_collection(collection_name),
+            collections.embed_documents, size, rng, SECTORS,
+        )
+        print(f"\nCatalog of {size} products indexed in {time.perf_counter() - started:.1f}s")
+
+        queries = synthetic_queries(rng, SECTORS, args.requests + args.warmup)
+        warmup, measured = queries[:args.warmup], queries[args.warmup:]
+
+        client = app.test_client()
+        for query in warmup:
+            client.post("/ai_search/search", json={"query": query, "mode": args.mode})
+        timer.reset()
+
+        latencies, statuses = [], Counter()
+        results_lock = threading.Lock()
+        shares = [measured[i::args.threads] for i in range(args.threads)]
+
+        def worker(share):
+            worker_client = app.test_client()
+            local = []
+            for query in share:
+                request_started = time.perf_counter()
+                response = worker_client.post("/ai_search/search", json={"query": query, "mode": args.mode})
+                local.append((time.perf_counter() - request_started, response.status_code))
+            with results_lock:
+                for latency, status in local:
+                    latencies.append(latency)
+                    statuses[status] += 1
+
+        threads = [threading.Thread(target=worker, args=(share,)) for share in shares]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        total = sum(latencies) or 1e-9
+        print(f"Requests:     {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s), mode={args.mode}")
+        print(f"Statuses:     {dict(sorted(statuses.items()))}")
+        print(
+            f"Latency:      p50 {percentile(latencies, 50):.1f} ms, "
+            f"p95 {percentile(latencies, 95):.1f} ms, p99 {percentile(latencies, 99):.1f} ms"
+        )
+        print(f"{'Stage':<12}{'calls':>8}{'mean ms':>10}{'p95 ms':>10}{'share':>8}")
+        for stage, samples in timer.samples.items():
+            print(
+                f"{stage:<12}{len(samples):>8}{np.mean(samples) * 1000:>10.1f}"
+                f"{percentile(samples, 95):>10.1f}{sum(samples) / total:>8.1%}"
+            )
+
+    stub.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda v: [int(size) for size in v.split(",")], default=[1000, 10000])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per catalog size")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--mode", choices=["llm", "fast"], default="llm")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fixed seconds per stub LLM call")
+    parser.add_argument("--prefill-rate", type=float, default=2000, help="Prompt tokens per second of the stub LLM")
+    parser.add_argument("--llm-matches", type=int, default=5, help="Products the stub LLM returns per answer")
+    parser.add_argument("--cache", action="store_true", help="Keep the search result caches enabled")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use hashed bag-of-words embeddings instead of the ONNX model")
+    parser.add_argument("--seed", type=int, default=42)
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
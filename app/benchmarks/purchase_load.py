@@ -0,0 +1,169 @@
+"""
+Concurrent load test for POST /products/purchase/<product_id>.
+
+Seeds sellers, funded buyers and products in the configured database, fires
+purchases at them from many threads through the real Flask view, then checks
+that no product was sold twice, no wallet went negative and the total amount
+of money across the seeded users is unchanged. Product events are not written to
+the outbox during the run, so the relay never publishes sales of seeded products,
+which are deleted afterwards.
+
+Run from the app directory while MySQL is up:
+    python -m benchmarks.purchase_load --threads 32 --attempts 5000
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+
+from main import app
+from db.extensions import db
+from db.models import Product, User, WalletEntry, WalletSnapshot
+from api.views.utils import create_tokens
+from api.views.services import products_service
+from api.views.services.wallet_service import get_wallet_balance, from_minor_units
+
+
+def seed(run_id, sellers, buyers, products, wallet):
+
+    """Create sellers, funded buyers and products; return (seller_ids, buyer_ids, product_ids)."""
+
+    seller_users = [
+        User(nickname=f"lt{run_id}s{i}", email=f"lt{run_id}s{i}@load.test", password_hash="-", wallet=0)
+        for i in range(sellers)
+    ]
+    buyer_users = [
+        User(nickname=f"lt{run_id}b{i}", email=f"lt{run_id}b{i}@load.test", password_hash="-", wallet=wallet)
+        for i in range(buyers)
+    ]
+    db.session.add_all(seller_users + buyer_users)
+    db.session.commit()
+
+    product_rows = [
+        Product(
+            name=f"Load test product {i}",
+            price=round(random.uniform(1, wallet / 2), 2),
+            description="Load test product.",
+            seller_id=random.choice(seller_users).id,
+        )
+        for i in range(products)
+    ]
+    db.session.add_all(product_rows)
+    db.session.commit()
+
+    return (
+        [u.id for u in seller_users],
+        [u.id for u in buyer_users],
+        [p.id for p in product_rows],
+    )
+
+
+def balances(user_ids):
+    return {user_id: get_wallet_balance(user_id) for user_id in user_ids}
+
+
+def cleanup(user_ids, product_ids):
+    WalletEntry.query.filter(WalletEntry.user_id.in_(user_ids)).delete(synchronize_session=False)
+    WalletSnapshot.query.filter(WalletSnapshot.user_id.in_(user_ids)).delete(synchronize_session=False)
+    Product.query.filter(Product.id.in_(product_ids)).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run(args):
+
+    """Seed data, hammer the purchase endpoint concurrently and verify invariants; returns exit code."""
+
+    run_id = int(time.time())
+    # Seeded products are deleted after the run, so their events must never reach consumers.
+    products_service._queue_product_event = lambda payload: None
+
+    with app.app_context():
+        seller_ids, buyer_ids, product_ids = seed(
+            run_id, args.sellers, args.buyers, args.products, args.wallet
+        )
+        user_ids = seller_ids + buyer_ids
+        balance_before = sum(balances(user_ids).values())
+
+    tokens = {buyer_id: create_tokens(buyer_id)[0] for buyer_id in buyer_ids}
+    # A small hot set concentrates buyers on the same rows to provoke races.
+    hot_products = product_ids[: max(1, int(len(product_ids) * args.hot_ratio))]
+
+    results = []
+    results_lock = threading.Lock()
+    per_thread = args.attempts // args.threads
+
+    def worker():
+        client = app.test_client()
+        local = []
+        for _ in range(per_thread):
+            pool = hot_products if random.random() < 0.8 else product_ids
+            product_id = random.choice(pool)
+            buyer_id = random.choice(buyer_ids)
+            response = client.post(
+                f"/products/purchase/{product_id}",
+                headers={"Authorization": f"Bearer {tokens[buyer_id]}"},
+            )
+            local.append((product_id, response.status_code))
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for _, status in results)
+    sales = Counter(product_id for product_id, status in results if status == 200)
+    double_sold = [product_id for product_id, count in sales.items() if count > 1]
+
+    with app.app_context():
+        sold_in_db = Product.query.filter(Product.id.in_(product_ids), Product.is_sold == True).count()
+        balances_after = balances(user_ids)
+        balance_after = sum(balances_after.values())
+        negative_wallets = sum(1 for balance in balances_after.values() if balance < 0)
+
+        print(f"Attempts:          {len(results)} in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)")
+        print(f"Purchases:         {statuses[200]} ({statuses[200] / elapsed:.1f} purchases/s)")
+        print(f"Status breakdown:  {dict(sorted(statuses.items()))}")
+        print(f"Sold in database:  {sold_in_db}")
+        print(f"Double sales:      {len(double_sold)}")
+        print(f"Negative wallets:  {negative_wallets}")
+        print(f"Balance drift:     {from_minor_units(balance_after - balance_before):.2f}")
+
+        ok = (
+            not double_sold
+            and sold_in_db == statuses[200]
+            and negative_wallets == 0
+            and balance_after == balance_before
+            and statuses[500] == 0
+        )
+
+        if not args.keep:
+            cleanup(user_ids, product_ids)
+
+    print("✅ Invariants hold." if ok else "❌ Invariants violated.")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--sellers", type=int, default=10)
+    parser.add_argument("--buyers", type=int, default=50)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--hot-ratio", type=float, default=0.05, help="Share of products that receive 80%% of attempts")
+    parser.add_argument("--wallet", type=float, default=1000.0, help="Starting balance of each buyer")
+    parser.add_argument("--keep", action="store_true", help="Keep seeded rows after the run")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import redis
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+redis_host = os.getenv("REDIS_HOST", "redis")
+login_rate_limit = int(os.getenv("LOGIN_RATE_LIMIT", 10))
+login_rate_window = int(os.getenv("LOGIN_RATE_WINDOW", 300))
+
+cache_schema_version = "v1"
+
+redis_client = redis.Redis(
+    host=redis_host,
+    port=6379,
+    decode_responses=True,
+    socket_timeout=0.5,
+    socket_connect_timeout=0.5,
+)
+
+
+def _attempts_key(identifier: str) -> str:
+    digest = hashlib.sha1(identifier.strip().lower().encode()).hexdigest()
+    return f"auth:{cache_schema_version}:login_attempts:{digest}"
+
+
+def register_login_attempt(identifier: str) -> int:
+
+    """
+    Count a login attempt for an account in a fixed window shared by all workers.
+    Returns 0 when the attempt is allowed, otherwise the seconds until the window resets.
+    """
+
+    if login_rate_limit <= 0:
+        return 0
+
+    key = _attempts_key(identifier)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.set(key, 0, ex=login_rate_window, nx=True)
+        pipe.incr(key)
+        pipe.ttl(key)
+        _, attempts, ttl = pipe.execute()
+    except redis.RedisError:
+        return 0
+
+    if attempts > login_rate_limit:
+        return max(1, ttl)
+    return 0
+
+
+def clear_login_attempts(identifier: str):
+    try:
+        redis_client.delete(_attempts_key(identifier))
+    except redis.RedisError:
+        pass
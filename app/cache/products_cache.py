@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import redis
+import orjson
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+redis_host = os.getenv("REDIS_HOST", "redis")
+product_cache_ttl = int(os.getenv("PRODUCT_CACHE_TTL", 300))
+listing_cache_ttl = int(os.getenv("PRODUCT_LISTING_CACHE_TTL", 30))
+similar_cache_ttl = int(os.getenv("SIMILAR_PRODUCTS_CACHE_TTL", 300))
+
+# Bump when the shape of cached payloads changes so old entries are ignored.
+cache_schema_version = "v3"
+catalog_version_key = f"products:{cache_schema_version}:catalog_version"
+catalog_modified_key = f"products:{cache_schema_version}:catalog_modified"
+
+redis_client = redis.Redis(
+    host=redis_host,
+    port=6379,
+    decode_responses=True,
+    socket_timeout=0.5,
+    socket_connect_timeout=0.5,
+)
+
+
+# Stores a product detail only if the product was not invalidated since the reader took its token.
+cache_product_script = redis_client.register_script("""
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+""")
+
+
+def _product_key(product_id: int) -> str:
+    return f"products:{cache_schema_version}:detail:{product_id}"
+
+
+def _product_token_key(product_id: int) -> str:
+    return f"products:{cache_schema_version}:detail_token:{product_id}"
+
+
+def _listing_key(catalog_version: str, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"products:{cache_schema_version}:listing:{catalog_version}:{digest}"
+
+
+def _similar_key(index_generation: str, product_id: int, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"products:{cache_schema_version}:similar:{index_generation}:{product_id}:{digest}"
+
+
+def _get_json(key: str):
+    try:
+        cached = redis_client.get(key)
+    except redis.RedisError:
+        return None
+    return orjson.loads(cached) if cached else None
+
+
+def _set_json(key: str, data, ttl: int):
+    try:
+        redis_client.set(key, orjson.dumps(data), ex=ttl)
+    except redis.RedisError:
+        pass
+
+
+def _bump_catalog(pipe):
+    now = time.time()
+    # Seeding from the clock first keeps versions unique even if Redis lost the key.
+    pipe.set(catalog_version_key, int(now * 1000), nx=True)
+    pipe.incr(catalog_version_key)
+    pipe.set(catalog_modified_key, int(now))
+
+
+def get_catalog_state():
+
+    """
+    Return (version, modified_at) of the catalog, or None when Redis is unavailable.
+    A missing version is seeded from the clock, like in _bump_catalog; modified_at is
+    the unix time of the last bump, or None if unknown.
+    """
+
+    try:
+        version, modified_at = redis_client.mget(catalog_version_key, catalog_modified_key)
+        if version is None:
+            redis_client.set(catalog_version_key, int(time.time() * 1000), nx=True)
+            version = redis_client.get(catalog_version_key)
+    except redis.RedisError:
+        return None
+    return version, int(modified_at) if modified_at else None
+
+
+def get_catalog_version() -> str:
+
+    """Return the current catalog generation; listing keys embed it so a bump invalidates them all."""
+
+    state = get_catalog_state()
+    return state[0] if state else "0"
+
+
+def get_cached_product(product_id: int):
+    return _get_json(_product_key(product_id))
+
+
+def get_product_cache_token(product_id: int):
+
+    """
+    Invalidation counter of a product's cached detail, or None when Redis is unavailable.
+    Read it before loading the row and pass it to cache_product.
+    """
+
+    try:
+        return redis_client.get(_product_token_key(product_id)) or "0"
+    except redis.RedisError:
+        return None
+
+
+def cache_product(product_id: int, data: dict, token: str):
+
+    """
+    Store a product's detail unless invalidate_product ran after token was read: the row
+    was then loaded before that write committed, and caching it would serve stale data.
+    """
+
+    if token is None:
+        return
+    try:
+        cache_product_script(
+            keys=[_product_key(product_id), _product_token_key(product_id)],
+            args=[orjson.dumps(data), token, product_cache_ttl],
+            client=redis_client,
+        )
+    except redis.RedisError:
+        pass
+
+
+def get_cached_listing(catalog_version: str, params: dict):
+    return _get_json(_listing_key(catalog_version, params))
+
+
+def cache_listing(catalog_version: str, params: dict, data: dict):
+    _set_json(_listing_key(catalog_version, params), data, listing_cache_ttl)
+
+
+def get_cached_similar(index_generation: str, product_id: int, params: dict):
+    return _get_json(_similar_key(index_generation, product_id, params))
+
+
+def cache_similar(index_generation: str, product_id: int, params: dict, data: dict):
+    _set_json(_similar_key(index_generation, product_id, params), data, similar_cache_ttl)
+
+
+def invalidate_catalog():
+
+    """Bump the catalog generation; stale listing pages expire on their own TTL."""
+
+    try:
+        pipe = redis_client.pipeline()
+        _bump_catalog(pipe)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+def invalidate_product(product_id: int):
+
+    """Drop the cached detail of a product and every cached listing page."""
+
+    try:
+        pipe = redis_client.pipeline()
+        pipe.delete(_product_key(product_id))
+        # Readers that loaded the row before this write can no longer store it.
+        pipe.incr(_product_token_key(product_id))
+        pipe.expire(_product_token_key(product_id), product_cache_ttl)
+        _bump_catalog(pipe)
+        pipe.execute()
+    except redis.RedisError:
+        pass
@@ -0,0 +1,173 @@
+import os
+import re
+import redis
+import hashlib
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+redis_host = os.getenv("REDIS_HOST", "redis")
+search_cache_ttl = int(os.getenv("SEARCH_CACHE_TTL", 600))
+search_cache_similarity = float(os.getenv("SEARCH_CACHE_SIMILARITY", 0.95))
+search_cache_max_vectors = int(os.getenv("SEARCH_CACHE_MAX_VECTORS", 1000))
+# Incremental index updates start a new generation at most this often (seconds).
+search_cache_refresh_interval = int(os.getenv("SEARCH_CACHE_REFRESH_INTERVAL", 30))
+
+# v2: similarity vectors moved from a hash to one packed, append-only string.
+cache_schema_version = "v2"
+index_generation_key = f"ai_search:{cache_schema_version}:index_generation"
+index_generation_throttle_key = f"ai_search:{cache_schema_version}:index_generation_throttle"
+
+# Binary-safe client: query embeddings are stored as raw float32 bytes.
+redis_client = redis.Redis(
+    host=redis_host,
+    port=6379,
+    socket_timeout=0.5,
+    socket_connect_timeout=0.5,
+)
+
+
+def normalize_query(query: str) -> str:
+
+    """Lowercase, drop punctuation and collapse whitespace so trivially different queries share a key."""
+
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def _digest(normalized_query: str) -> str:
+    return hashlib.sha1(normalized_query.encode()).hexdigest()
+
+
+def _result_key(generation: str, digest: str) -> str:
+    return f"ai_search:{cache_schema_version}:{generation}:result:{digest}"
+
+
+def _vectors_key(generation: str) -> str:
+    return f"ai_search:{cache_schema_version}:{generation}:vectors"
+
+
+digest_size = 40
+
+# This process's copy of the current generation's packed vectors blob.
+_local_vectors = (None, b"")
+
+
+def get_index_generation() -> str:
+
+    """Current index generation; cache keys embed it, so a bump invalidates every cached result."""
+
+    try:
+        generation = redis_client.get(index_generation_key)
+    except redis.RedisError:
+        return "0"
+    return generation.decode() if generation else "0"
+
+
+def bump_index_generation(min_interval: int = 0) -> bool:
+
+    """
+    Start a new index generation, orphaning every cached result. With min_interval, bumps
+    are coalesced across processes: returns False without bumping when another bump
+    happened less than min_interval seconds ago, and the caller retries later.
+    """
+
+    try:
+        if min_interval > 0 and not redis_client.set(index_generation_throttle_key, 1, ex=min_interval, nx=True):
+            return False
+        redis_client.incr(index_generation_key)
+    except redis.RedisError:
+        return False
+    return True
+
+
+def get_cached_result(generation: str, normalized_query: str):
+
+    """Exact-match lookup on the normalized query."""
+
+    try:
+        cached = redis_client.get(_result_key(generation, _digest(normalized_query)))
+    except redis.RedisError:
+        return None
+    return cached.decode() if cached else None
+
+
+def _load_cached_vectors(generation: str) -> bytes:
+
+    """
+    Return the packed entries (hex digest + float32 vector) of the queries cached for a
+    generation. The blob only grows, so just the bytes appended since the last call are
+    fetched; a blob shorter than the local copy has expired and is read again in full.
+    """
+
+    global _local_vectors
+
+    local_generation, blob = _local_vectors
+    if local_generation != generation:
+        blob = b""
+
+    pipe = redis_client.pipeline()
+    pipe.strlen(_vectors_key(generation))
+    pipe.getrange(_vectors_key(generation), len(blob), -1)
+    remote_length, appended = pipe.execute()
+
+    if remote_length < len(blob):
+        blob, appended = b"", redis_client.get(_vectors_key(generation)) or b""
+
+    blob += appended
+    _local_vectors = (generation, blob)
+    return blob
+
+
+def get_similar_cached_result(generation: str, embedding):
+
+    """
+    Nearest-neighbour lookup: return the cached result of the most similar earlier query
+    if its cosine similarity to this one reaches search_cache_similarity.
+    """
+
+    try:
+        blob = _load_cached_vectors(generation)
+    except redis.RedisError:
+        return None
+
+    query = np.asarray(embedding, dtype=np.float32)
+    entry_type = np.dtype([("digest", f"S{digest_size}"), ("vector", "<f4", (query.shape[0],))])
+    if not blob or len(blob) % entry_type.itemsize:
+        return None
+
+    entries = np.frombuffer(blob, dtype=entry_type)
+    similarities = entries["vector"] @ (query / (np.linalg.norm(query) or 1.0))
+    best = int(np.argmax(similarities))
+    if similarities[best] < search_cache_similarity:
+        return None
+
+    try:
+        cached = redis_client.get(_result_key(generation, entries["digest"][best].decode()))
+    except redis.RedisError:
+        return None
+    return cached.decode() if cached else None
+
+
+def cache_result(generation: str, normalized_query: str, embedding, result: str):
+
+    """
+    Store a search result under its normalized query and, unless embedding is None,
+    register the embedding for similarity lookups.
+    """
+
+    digest = _digest(normalized_query)
+
+    try:
+        pipe = redis_client.pipeline()
+        pipe.set(_result_key(generation, digest), result, ex=search_cache_ttl)
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+            entry = digest.encode() + vector.astype("<f4").tobytes()
+            if redis_client.strlen(_vectors_key(generation)) < search_cache_max_vectors * len(entry):
+                pipe.append(_vectors_key(generation), entry)
+                pipe.expire(_vectors_key(generation), search_cache_ttl)
+        pipe.execute()
+    except redis.RedisError:
+        pass
@@ -0,0 +1,108 @@
+import os
+import redis
+import threading
+from dotenv import load_dotenv
+from chromadb import HttpClient, PersistentClient
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+from chroma.embedding_store import EmbeddingStore
+from api.views.services.circuit_breaker import CircuitBreaker
+
+load_dotenv()
+
+chromadb_host = os.getenv("CHROMADB_HOST", "chroma")
+# A local directory here runs Chroma in-process instead of talking to the server (benchmarks, tests).
+chromadb_path = os.getenv("CHROMADB_PATH")
+redis_host = os.getenv("REDIS_HOST", "redis")
+embedding_store_dir = os.getenv("EMBEDDING_STORE_DIR", "data/embeddings")
+embedding_model_id = os.getenv("EMBEDDING_MODEL_ID", "all-MiniLM-L6-v2")
+embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+redis_client = redis.Redis(host=redis_host, port=6379, decode_responses=True)
+# Used for both indexing and queries so search can embed a query once and reuse the vector.
+embedding_function = DefaultEmbeddingFunction()
+# Indexing only embeds documents whose text changed; everything else is read back from disk.
+embedding_store = EmbeddingStore(embedding_store_dir, embedding_model_id, embedding_function, embedding_batch_size)
+
+# Searches go through this breaker, so a Chroma outage fails fast instead of stalling requests.
+chroma_breaker = CircuitBreaker("Chroma")
+_client = None
+_client_lock = threading.Lock()
+
+# Collection served before the first blue/green rebuild.
+default_collection_name = "products"
+versioned_collection_prefix = "products_v"
+active_collection_key = "products:index:active_collection"
+building_collection_key = "products:index:building_collection"
+
+
+def get_client():
+
+    """
+    Return the process-wide Chroma client, connecting on first use rather than at import,
+    so processes start without Chroma; raises ServiceUnavailable while it is unreachable.
+    """
+
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                with chroma_breaker.guard("connect"):
+                    _client = (
+                        PersistentClient(path=chromadb_path)
+                        if chromadb_path
+                        else HttpClient(host=chromadb_host, port=8000)
+                    )
+    return _client
+
+
+def get_active_collection_name() -> str:
+
+    """Name of the collection searches read from; swapped atomically by a full rebuild."""
+
+    return redis_client.get(active_collection_key) or default_collection_name
+
+
+def has_sold_metadata(name: str) -> bool:
+
+    """
+    Whether a collection's metadata carries is_sold for every product. The unversioned
+    default collection predates that field, so only products changed since carry it
+    until the first full rebuild swaps searches to a versioned collection.
+    """
+
+    return name != default_collection_name
+
+
+def get_building_collection_name():
+
+    """Name of the collection a full rebuild is currently filling, if any."""
+
+    return redis_client.get(building_collection_key)
+
+
+def get_collection(name: str):
+    return get_client().get_or_create_collection(name=name, embedding_function=embedding_function)
+
+
+def embed_documents(texts: list[str]):
+    return embedding_store.embed(texts)
+
+
+def embed_query(text: str):
+    # Queries are looked up in the store but not added to it, so it only grows with the catalog.
+    return embedding_store.embed([text], persist=False)[0]
+
+
+def get_active_collection():
+    return get_collection(get_active_collection_name())
+
+
+def get_write_collections():
+
+    """Collections incremental updates must reach: the active one and any being rebuilt."""
+
+    names = [get_active_collection_name()]
+    building = get_building_collection_name()
+    if building and building not in names:
+        names.append(building)
+    return [get_collection(name) for name in names]
@@ -0,0 +1,147 @@
+import os
+import json
+import fcntl
+import hashlib
+import threading
+import numpy as np
+
+digest_size = 20  # sha1
+
+
+class EmbeddingStore:
+
+    """
+    Append-only on-disk cache of embeddings keyed by a hash of the model id and the text.
+    Vectors live in a float32 matrix read through a memory map, their keys in a parallel
+    file of fixed-size digests; row i of one belongs to digest i of the other. Several
+    processes may share a directory: appends are serialized with a file lock and readers
+    pick up rows written by others on their next lookup.
+    """
+
+    def __init__(self, directory: str, model_id: str, embedding_function, batch_size: int = 256):
+        self.directory = os.path.join(directory, model_id)
+        self.model_id = model_id
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, ".lock")
+        self._lock = threading.Lock()
+        self._index = {}
+        self._vectors = None
+        self._dim = None
+        self._rows = 0
+
+    def _digest(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_id}\0{text}".encode()).digest()
+
+    def _refresh(self):
+
+        """Load digests appended since the last look and remap the vector matrix."""
+
+        if not os.path.exists(self.keys_path):
+            return
+        rows = os.path.getsize(self.keys_path) // digest_size
+        if rows == self._rows:
+            return
+
+        if self._dim is None:
+            with open(self.meta_path) as f:
+                self._dim = json.load(f)["dim"]
+
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._rows * digest_size)
+            data = f.read((rows - self._rows) * digest_size)
+        for offset in range(0, len(data), digest_size):
+            self._index[data[offset:offset + digest_size]] = self._rows + offset // digest_size
+
+        self._rows = rows
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+
+    def _append(self, digests: list[bytes], vectors: np.ndarray):
+
+        """
+        Persist new rows under an exclusive file lock. Vectors are written before their keys
+        and both files are first cut back to the committed row count, so a crash mid-append
+        leaves no half-written row visible.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new = [i for i, digest in enumerate(digests) if digest not in self._index]
+                if not new:
+                    return
+
+                if self._dim is None:
+                    self._dim = int(vectors.shape[1])
+                    with open(self.meta_path, "w") as f:
+                        json.dump({"model_id": self.model_id, "dim": self._dim}, f)
+
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(self._rows * self._dim * 4)
+                    f.write(np.ascontiguousarray(vectors[new], dtype=np.float32).tobytes())
+                with open(self.keys_path, "ab") as f:
+                    f.truncate(self._rows * digest_size)
+                    f.write(b"".join(digests[i] for i in new))
+
+                self._refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _compute(self, texts: list[str]) -> np.ndarray:
+        return np.vstack([
+            np.asarray(self.embedding_function(texts[start:start + self.batch_size]), dtype=np.float32)
+            for start in range(0, len(texts), self.batch_size)
+        ])
+
+    def embed(self, texts: list[str], persist: bool = True) -> np.ndarray:
+
+        """
+        Return an (n, dim) float32 matrix of embeddings for texts. Cached rows are read from
+        the memory map; only unseen texts are embedded, in batches of batch_size, and stored
+        when persist is set. Falls back to embedding everything if the store is unusable.
+        """
+
+        if not texts:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+
+        digests = [self._digest(text) for text in texts]
+
+        try:
+            with self._lock:
+                self._refresh()
+                missing = {}
+                for digest, text in zip(digests, texts):
+                    if digest not in self._index:
+                        missing.setdefault(digest, text)
+
+            computed = {}
+            if missing:
+                missing_digests = list(missing)
+                vectors = self._compute([missing[digest] for digest in missing_digests])
+                computed = dict(zip(missing_digests, vectors))
+                if persist:
+                    with self._lock:
+                        self._append(missing_digests, vectors)
+
+            with self._lock:
+                index, matrix = self._index, self._vectors
+                dim = self._dim or next(iter(computed.values())).shape[0]
+
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Embedding store unavailable, embedding directly: {e}")
+            return self._compute(texts)
+
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        cached_positions = [i for i, digest in enumerate(digests) if digest not in computed]
+        if cached_positions:
+            rows = np.fromiter((index[digests[i]] for i in cached_positions), dtype=np.int64)
+            result[cached_positions] = matrix[rows]
+        for i, digest in enumerate(digests):
+            if digest in computed:
+                result[i] = computed[digest]
+        return result
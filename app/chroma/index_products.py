@@ -1,58 +1,159 @@
 import os
+import time
+from datetime import datetime
 from dotenv import load_dotenv
-from chromadb import HttpClient
+from sqlalchemy import select
 
 from db.models import Product
 from main import app
 from db.extensions import db
+from cache.search_cache import bump_index_generation
+from chroma.collections import (
+    get_client,
+    redis_client,
+    get_collection,
+    embed_documents,
+    active_collection_key,
+    building_collection_key,
+    versioned_collection_prefix,
+    get_active_collection_name,
+)
 
 load_dotenv()
 
-chromadb_host = os.getenv("CHROMADB_HOST", "chroma")
-client = HttpClient(host=chromadb_host, port=8000)
-collection = client.get_or_create_collection(name="products")
+reindex_chunk_size = int(os.getenv("REINDEX_CHUNK_SIZE", 500))
+rebuild_state_key = "products:index:rebuild"
 
 
-def get_all_products():
+def product_document(product) -> str:
+    return f"{product.name}. {product.description}"
+
+
+def product_metadata(product) -> dict:
+
+    """Chroma metadata of a product; Chroma rejects None values, so fields are normalized."""
+
+    price = (
+        float(product.price)
+        if product.price is not None and isinstance(product.price, (int, float))
+        else 0.0
+    )
+    return {
+        "name": product.name,
+        "description": product.description or "",
+        "price": price,
+        "seller_id": product.seller_id,
+        "is_sold": bool(product.is_sold),
+    }
+
+
+def stream_products(after_id: int, chunk_size: int):
+
+    """
+    Yield chunks of product rows with id > after_id in id order. Each chunk is its own
+    keyset query (id > last id, LIMIT chunk_size), since the mysqlconnector driver buffers
+    whole result sets and has no server-side cursor to stream from.
+    """
+
+    statement = select(
+        Product.id,
+        Product.name,
+        Product.description,
+        Product.price,
+        Product.seller_id,
+        Product.is_sold,
+    ).order_by(Product.id).limit(chunk_size)
+
+    last_id = after_id
     with app.app_context():
-        return Product.query.all()
+        while True:
+            rows = db.session.execute(statement.where(Product.id > last_id)).all()
+            # Do not hold a transaction open while the chunk is being embedded.
+            db.session.close()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1].id
+
+
+def start_or_resume_rebuild(fresh: bool = False):
+
+    """
+    Return (collection_name, last_id, indexed) of the rebuild to run: the interrupted one
+    recorded in Redis, or a new versioned collection when there is none or fresh is set.
+    """
+
+    state = redis_client.hgetall(rebuild_state_key)
+    if state and not fresh:
+        print(f"↩️ Resuming rebuild of '{state['collection']}' after product #{state['last_id']}.")
+        return state["collection"], int(state["last_id"]), int(state["indexed"])
+
+    if state:
+        try:
+            get_client().delete_collection(state["collection"])
+        except Exception:
+            pass
+
+    name = f"{versioned_collection_prefix}{datetime.utcnow():%Y%m%d%H%M%S%f}"
+    redis_client.hset(rebuild_state_key, mapping={"collection": name, "last_id": 0, "indexed": 0})
+    return name, 0, 0
+
+
+def swap_active_collection(name: str):
+
+    """
+    Point searches at the rebuilt collection in one atomic write, then drop every older
+    versioned collection except the one just replaced, which in-flight searches may still read.
+    """
+
+    previous = get_active_collection_name()
+
+    pipe = redis_client.pipeline()
+    pipe.set(active_collection_key, name)
+    pipe.delete(building_collection_key)
+    pipe.delete(rebuild_state_key)
+    pipe.execute()
+    bump_index_generation()
+
+    client = get_client()
+    for collection in client.list_collections():
+        collection_name = getattr(collection, "name", collection)
+        if collection_name.startswith(versioned_collection_prefix) and collection_name not in (name, previous):
+            client.delete_collection(collection_name)
 
 
-def index_products():
+def index_products(fresh: bool = False):
     """
-    Retrieve all products, prepare documents and metadata,
-    and add them to the 'products' ChromaDB collection.
+    Rebuild the product index into a fresh versioned collection, reading products
+    from MySQL and upserting them chunk by chunk so memory stays bounded, then swap
+    searches over to it. Progress is checkpointed in Redis after every chunk, so a
+    crashed rebuild resumes where it stopped.
     """
-    products = get_all_products()
-    documents, ids, metadatas = [], [], []
+    name, last_id, indexed = start_or_resume_rebuild(fresh)
+    collection = get_collection(name)
+    # Incremental updates also land in the new collection while it is being filled.
+    redis_client.set(building_collection_key, name)
 
-    for product in products:
-        doc = f"{product.name}. {product.description}"
-        doc_id = str(product.id)
+    with app.app_context():
+        total = Product.query.count()
+
+    started = time.perf_counter()
+    indexed_at_start = indexed
 
-        price = (
-            float(product.price)
-            if product.price is not None and isinstance(product.price, (int, float))
-            else 0.0
+    for rows in stream_products(last_id, reindex_chunk_size):
+        documents = [product_document(row) for row in rows]
+        collection.upsert(
+            ids=[str(row.id) for row in rows],
+            documents=documents,
+            embeddings=embed_documents(documents),
+            metadatas=[product_metadata(row) for row in rows],
         )
-        metadata = {
-            "name": product.name,
-            "description": product.description,
-            "price": price
-        }
-
-        documents.append(doc)
-        ids.append(doc_id)
-        metadatas.append(metadata)
-
-    if not documents or not ids or not metadatas:
-        print("⚠️ No products found to index. Skipping ChromaDB add.")
-        return
-
-    collection.add(
-        documents=documents,
-        ids=ids,
-        metadatas=metadatas
-    )
+        last_id = rows[-1].id
+        indexed += len(rows)
+        redis_client.hset(rebuild_state_key, mapping={"last_id": last_id, "indexed": indexed})
+
+        rate = (indexed - indexed_at_start) / max(time.perf_counter() - started, 1e-6)
+        print(f"⏳ Indexed {indexed}/{total} products ({rate:.0f}/s) into '{name}'.")
 
-    print(f"\n✅ Indexed {len(documents)} products in the collection 'products'.")
+    swap_active_collection(name)
+    print(f"\n✅ Indexed {indexed} products in the collection '{name}', now serving searches.")
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import pika
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pika.exceptions import AMQPConnectionError
+
+from main import app
+from db.models import Product
+from chroma.collections import redis_client, embed_documents, get_write_collections
+from chroma.index_products import product_document, product_metadata
+from cache.search_cache import bump_index_generation, search_cache_refresh_interval
+
+load_dotenv()
+
+rabbitmq_host = os.getenv("RABBIT_MQ_HOST", "rabbitmq")
+indexer_queue = os.getenv("INDEXER_QUEUE", "products.indexer")
+indexer_batch_size = int(os.getenv("INDEXER_BATCH_SIZE", 100))
+indexer_flush_interval = float(os.getenv("INDEXER_FLUSH_INTERVAL", 1.0))
+# Longest pause between retries of a batch that failed to index.
+indexer_max_retry_delay = float(os.getenv("INDEXER_MAX_RETRY_DELAY", 30))
+
+watermark_key = "products:index:watermark"
+# Rows committed slightly out of updated_at order are re-read on the next catch-up.
+watermark_overlap = timedelta(minutes=5)
+
+
+def affects_results(collection, products, missing) -> bool:
+
+    """Whether syncing these rows changes what searches over the collection can return."""
+
+    ids = [str(product.id) for product in products] + [str(product_id) for product_id in missing]
+    current = collection.get(ids=ids, include=["documents", "metadatas"])
+    indexed = dict(zip(current["ids"], zip(current["documents"], current["metadatas"])))
+
+    if any(str(product_id) in indexed for product_id in missing):
+        return True
+    return any(
+        indexed.get(str(product.id)) != (product_document(product), product_metadata(product))
+        for product in products
+    )
+
+
+def sync_products(product_ids) -> bool:
+
+    """
+    Bring the index in line with the database for the given products: upsert the ones that
+    exist and delete the rest. Events are only hints, so out-of-order or duplicate events
+    converge to the current row. Returns whether the active collection's content changed,
+    i.e. whether cached search results may now be stale.
+    """
+
+    product_ids = set(product_ids)
+    if not product_ids:
+        return False
+
+    with app.app_context():
+        products = Product.query.filter(Product.id.in_(product_ids)).all()
+
+    missing = product_ids - {product.id for product in products}
+    documents = [product_document(product) for product in products]
+    embeddings = embed_documents(documents) if products else None
+
+    collections = get_write_collections()
+    changed = affects_results(collections[0], products, missing)
+
+    for collection in collections:
+        if products:
+            collection.upsert(
+                ids=[str(product.id) for product in products],
+                documents=documents,
+                embeddings=embeddings,
+                metadatas=[product_metadata(product) for product in products],
+            )
+        if missing:
+            collection.delete(ids=[str(product_id) for product_id in missing])
+
+    return changed
+
+
+def get_watermark():
+    value = redis_client.get(watermark_key)
+    return datetime.fromisoformat(value) if value else None
+
+
+def catch_up(chunk_size: int = 500):
+
+    """
+    Re-index every product updated since the stored watermark (or all products on the
+    first run) in keyset chunks, then move the watermark to the start of this run.
+    Deletions are not visible here; they arrive as events.
+    """
+
+    started = datetime.utcnow()
+    watermark = get_watermark()
+    since = watermark - watermark_overlap if watermark else None
+    last_updated_at, last_id = None, 0
+    indexed, changed = 0, False
+
+    while True:
+        with app.app_context():
+            query = Product.query.with_entities(Product.id, Product.updated_at)
+            if since is None:
+                query = query.filter(Product.id > last_id).order_by(Product.id)
+            else:
+                query = query.filter(Product.updated_at >= since)
+                if last_updated_at is not None:
+                    query = query.filter(
+                        (Product.updated_at > last_updated_at)
+                        | ((Product.updated_at == last_updated_at) & (Product.id > last_id))
+                    )
+                query = query.order_by(Product.updated_at, Product.id)
+            rows = query.limit(chunk_size).all()
+
+        if not rows:
+            break
+
+        changed = sync_products(row.id for row in rows) or changed
+        indexed += len(rows)
+        last_updated_at, last_id = rows[-1].updated_at, rows[-1].id
+
+    if changed:
+        bump_index_generation()
+    redis_client.set(watermark_key, started.isoformat())
+    print(f"✅ Catch-up indexed {indexed} products.")
+
+
+def consume():
+
+    """
+    Consume product events from a durable queue bound to the 'products' exchange and apply
+    them in micro-batches: a batch is flushed when it reaches indexer_batch_size events or
+    when no event arrived for indexer_flush_interval seconds, then acked in one go. A batch
+    that fails to index is requeued and retried with exponential backoff.
+    Cached search results are invalidated at most every search_cache_refresh_interval
+    seconds, and only after a batch that changed the index.
+    """
+
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbitmq_host))
+    channel = connection.channel()
+
+    channel.exchange_declare(exchange='products', exchange_type='fanout', durable=True)
+    channel.queue_declare(queue=indexer_queue, durable=True)
+    channel.queue_bind(exchange='products', queue=indexer_queue)
+    channel.basic_qos(prefetch_count=indexer_batch_size)
+
+    pending_ids, pending_count, last_tag = set(), 0, None
+    results_stale = False
+    failures = 0
+
+    for method, properties, body in channel.consume(
+        indexer_queue, inactivity_timeout=indexer_flush_interval
+    ):
+        if method is not None:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                # Malformed events are acked with the batch; requeueing would loop forever.
+                print(f"⚠️ Skipping malformed product event: {body[:200]!r}")
+                data = {}
+            if "id" in data:
+                pending_ids.add(data["id"])
+            pending_count += 1
+            last_tag = method.delivery_tag
+
+        if last_tag is not None and (method is None or pending_count >= indexer_batch_size):
+            try:
+                results_stale = sync_products(pending_ids) or results_stale
+            except Exception as e:
+                failures += 1
+                delay = min(2 ** failures, indexer_max_retry_delay)
+                print(f"❌ Could not index {len(pending_ids)} products, retrying in {delay:.0f}s: {e}")
+                channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=True)
+                pending_ids, pending_count, last_tag = set(), 0, None
+                connection.sleep(delay)
+                continue
+
+            failures = 0
+            channel.basic_ack(delivery_tag=last_tag, multiple=True)
+            pending_ids, pending_count, last_tag = set(), 0, None
+
+        # Also retried on idle ticks, so the last change of a burst is not left cached.
+        if results_stale:
+            results_stale = not bump_index_generation(search_cache_refresh_interval)
+
+
+def run_indexer(catch_up_only: bool = False):
+
+    """
+    Catch up from the watermark, then keep the index fresh from events. Broker, Chroma and
+    database errors are logged and retried, so the process never exits on its own.
+    """
+
+    while True:
+        try:
+            catch_up()
+            break
+        except Exception as e:
+            print(f"❌ Catch-up failed, retrying in 5s: {e}")
+            time.sleep(5)
+    if catch_up_only:
+        return
+
+    while True:
+        try:
+            consume()
+        except AMQPConnectionError as e:
+            print(f"❌ Lost RabbitMQ connection, reconnecting in 5s: {e}")
+        except Exception as e:
+            # Unacked events of the closed channel are redelivered after reconnecting.
+            print(f"❌ Indexer failed, reconnecting in 5s: {e}")
+        time.sleep(5)
@@ -8,6 +8,8 @@ class User(db.Model):
     nickname = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(128), unique=True, nullable=False)
     password_hash = db.Column(db.String(512), nullable=False)
+    # Opening balance carried over from before the wallet ledger; live balances
+    # come from WalletSnapshot + WalletEntry, see wallet_service.get_wallet_balance.
     wallet = db.Column(db.Float, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -20,9 +22,18 @@ class Product(db.Model):
     seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     is_sold = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incremented by every write; updated_at has only 1-second precision in MySQL, so ETags use this.
+    version = db.Column(db.Integer, default=1, server_default="1", nullable=False)
 
     seller = db.relationship("User", backref="products")
 
+    __table_args__ = (
+        db.Index('ix_product_is_sold_created_at_id', 'is_sold', 'created_at', 'id'),
+        db.Index('ix_product_seller_is_sold_created_at_id', 'seller_id', 'is_sold', 'created_at', 'id'),
+        db.Index('ix_product_updated_at_id', 'updated_at', 'id'),
+    )
+
 
 class Subscription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,3 +44,39 @@ class Subscription(db.Model):
     __table_args__ = (
         db.UniqueConstraint('subscriber_id', 'seller_id', name='unique_subscription'),
     )
+
+
+class WalletEntry(db.Model):
+
+    """Append-only wallet movement; amount is signed and in minor units (cents)."""
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)
+    kind = db.Column(db.String(32), nullable=False)
+    product_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_wallet_entry_user_id_id', 'user_id', 'id'),
+        db.Index('ix_wallet_entry_created_at', 'created_at'),
+    )
+
+
+class WalletSnapshot(db.Model):
+
+    """Balance of a user folded up to and including last_entry_id; also the per-user debit lock."""
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    balance = db.Column(db.BigInteger, nullable=False, default=0)
+    last_entry_id = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OutboxEvent(db.Model):
+
+    """Event written in the same transaction as the change it describes; drained by the outbox relay."""
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,48 @@
+from sqlalchemy import inspect, text
+
+from db.extensions import db
+
+# Columns added to tables that existed before them, with the DDL that adds them and an
+# optional backfill for existing rows. db.create_all() only creates missing tables.
+added_columns = {
+    ("product", "updated_at"): (
+        "ALTER TABLE product ADD COLUMN updated_at DATETIME NULL",
+        "UPDATE product SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL",
+    ),
+    ("product", "version"): (
+        "ALTER TABLE product ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        None,
+    ),
+}
+
+
+def upgrade_schema():
+
+    """
+    Bring tables created by an older version up to the current models: add the missing
+    columns listed in added_columns, then every index the models declare but the database
+    lacks. Idempotent, so it runs on every `flask create-db`.
+    """
+
+    inspector = inspect(db.engine)
+    existing_columns = {}
+
+    with db.engine.begin() as connection:
+        for (table, column), (ddl, backfill) in added_columns.items():
+            if table not in existing_columns:
+                existing_columns[table] = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing_columns[table]:
+                continue
+            print(f"⬆️ Adding column {table}.{column}")
+            connection.execute(text(ddl))
+            if backfill:
+                connection.execute(text(backfill))
+
+    # A fresh inspector, since the cached one predates the columns just added.
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                print(f"⬆️ Creating index {index.name}")
+                index.create(db.engine)
@@ -1,52 +1,138 @@
 import os
+import time
 import pika
 import json
 import redis
 import asyncio
+import threading
+import multiprocessing
+from functools import partial
 from telegram import Bot
 from dotenv import load_dotenv
+from pika.exceptions import AMQPConnectionError
 
 from main import app
+from db.extensions import db
 from db.models import Subscription
+from metrics.instrumentation import record_fanout
 
 load_dotenv()
 
 bot_token = os.getenv("TG_BOT_TOKEN", None)
 redis_host = os.getenv("REDIS_HOST", "redis")
 rabbitmq_host = os.getenv("RABBIT_MQ_HOST", "rabbitmq")
+notify_concurrency = int(os.getenv("NOTIFY_CONCURRENCY", 20))
+notifications_queue = os.getenv("NOTIFICATIONS_QUEUE", "products.notifications")
+consumer_prefetch = int(os.getenv("CONSUMER_PREFETCH", 32))
+consumer_workers = int(os.getenv("CONSUMER_WORKERS", 1))
+chat_id_chunk_size = 500
 redis_client = redis.Redis(host=redis_host, port=6379, decode_responses=True)
 bot = Bot(token=bot_token)
 
+# One event loop per consumer process, running in a background thread; the pika
+# callback hands fan-outs to it and acks from the connection thread when they finish.
+loop = None
+notify_semaphore = asyncio.Semaphore(notify_concurrency)
+
+
+def start_event_loop():
+    global loop
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="telegram-fanout", daemon=True).start()
+    asyncio.run_coroutine_threadsafe(bot.initialize(), loop).result()
+
+
+def get_subscriber_ids(seller_id):
+
+    """Return ids of everyone subscribed to the seller, selecting only the id column."""
+
+    with app.app_context():
+        rows = (
+            db.session.query(Subscription.subscriber_id)
+            .filter(Subscription.seller_id == seller_id)
+            .all()
+        )
+        return [subscriber_id for (subscriber_id,) in rows]
+
+
+def resolve_chat_ids(subscriber_ids):
+
+    """Look up Telegram chat ids with one pipelined round trip of chunked MGETs."""
+
+    if not subscriber_ids:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for start in range(0, len(subscriber_ids), chat_id_chunk_size):
+        chunk = subscriber_ids[start:start + chat_id_chunk_size]
+        pipe.mget([f"user:{subscriber_id}:chat_id" for subscriber_id in chunk])
+
+    return [chat_id for chunk in pipe.execute() for chat_id in chunk if chat_id]
+
 
 def callback(ch, method, properties, body):
 
     """
-    RabbitMQ callback triggered on product events: loads product data from message,
-    fetches all subscribers for the seller, and asynchronously sends Telegram notifications
-    to subscribers with product info.
+    RabbitMQ callback triggered on product events: resolves the chat ids of the seller's
+    subscribers in bulk and schedules the Telegram fan-out on the shared event loop.
+    The message is acked from the connection thread once every notification was dispatched,
+    together with recording the event's fan-out stats.
     """
 
-    with app.app_context():
-        data = json.loads(body)
-        seller_id = data["seller_id"]
-        product_name = data["name"]
-        product_price = data.get("price", "не указана")
-        product_description = data.get("description", "нет описания")
-
-        subs = Subscription.query.filter_by(seller_id=seller_id).all()
-        for sub in subs:
-            chat_id = redis_client.get(f"user:{sub.subscriber_id}:chat_id")
-            if chat_id:
-                asyncio.run(send_notification(chat_id, seller_id, product_name, product_price, product_description))
-
+    data = json.loads(body)
+    if data.get("event", "created") != "created":
         ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+
+    started = time.perf_counter()
+    seller_id = data["seller_id"]
+    chat_ids = resolve_chat_ids(get_subscriber_ids(seller_id))
+    resolved = time.perf_counter()
+
+    future = asyncio.run_coroutine_threadsafe(
+        fan_out(
+            chat_ids,
+            seller_id,
+            data["name"],
+            data.get("price", "не указана"),
+            data.get("description", "нет описания"),
+        ),
+        loop,
+    )
+    ack = partial(ch.basic_ack, delivery_tag=method.delivery_tag)
+
+    def finish(done):
+        fanout_seconds = time.perf_counter() - resolved
+        sent = 0 if done.exception() else done.result()
+
+        def record_and_ack():
+            record_fanout(len(chat_ids), sent, len(chat_ids) - sent, resolved - started, fanout_seconds)
+            ack()
+
+        ch.connection.add_callback_threadsafe(record_and_ack)
+
+    future.add_done_callback(finish)
+
+
+async def fan_out(chat_ids, seller_id, name, price, description):
+
+    """
+    Send the product notification to every chat concurrently, at most notify_concurrency
+    at a time; returns how many were delivered.
+    """
+
+    async def send(chat_id):
+        async with notify_semaphore:
+            return await send_notification(chat_id, seller_id, name, price, description)
+
+    return sum(await asyncio.gather(*(send(chat_id) for chat_id in chat_ids)))
 
 
 async def send_notification(chat_id, seller_id, name, price, description):
 
     """
     Sends a Telegram message notifying a subscriber about a new product from a seller,
-    formatting the message with product details.
+    formatting the message with product details. Returns whether it was delivered.
     """
 
     message = (
@@ -57,25 +143,61 @@ async def send_notification(chat_id, seller_id, name, price, description):
     )
     try:
         await bot.send_message(chat_id=chat_id, text=message)
+        return True
     except Exception as e:
         print(f"❌ Error sending message to Telegram: {e}")
+        return False
 
 
 def consume():
 
     """
-    Connects to RabbitMQ, declares a fanout exchange 'products', creates a temporary queue,
-    binds it to the exchange, and starts consuming messages using the callback.
+    Connects to RabbitMQ, declares the durable fanout exchange 'products' and a durable
+    queue shared by every consumer replica, so each event is handled once and survives
+    consumer restarts. At most consumer_prefetch unacked events are in flight per connection.
     """
 
     connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbitmq_host))
     channel = connection.channel()
 
-    channel.exchange_declare(exchange='products', exchange_type='fanout')
-    result = channel.queue_declare('', exclusive=True)
-    queue_name = result.method.queue
+    channel.exchange_declare(exchange='products', exchange_type='fanout', durable=True)
+    channel.queue_declare(queue=notifications_queue, durable=True)
+    channel.queue_bind(exchange='products', queue=notifications_queue)
 
-    channel.queue_bind(exchange='products', queue=queue_name)
-    channel.basic_consume(queue=queue_name, on_message_callback=callback)
+    channel.basic_qos(prefetch_count=consumer_prefetch)
+    channel.basic_consume(queue=notifications_queue, on_message_callback=callback)
 
     channel.start_consuming()
+
+
+def run_worker():
+
+    """Run one consumer process: start its event loop and keep consuming, reconnecting on broker errors."""
+
+    # Pooled MySQL connections opened before fork belong to the parent process.
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    start_event_loop()
+
+    while True:
+        try:
+            consume()
+        except AMQPConnectionError as e:
+            print(f"❌ Lost RabbitMQ connection, reconnecting in 5s: {e}")
+            time.sleep(5)
+
+
+def run_workers(workers: int = consumer_workers):
+
+    """Start the given number of consumer processes on the shared queue and wait for them."""
+
+    if workers <= 1:
+        run_worker()
+        return
+
+    processes = [multiprocessing.Process(target=run_worker) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
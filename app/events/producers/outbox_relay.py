@@ -0,0 +1,70 @@
+import os
+import json
+import time
+from dotenv import load_dotenv
+
+from main import app
+from db.extensions import db
+from db.models import OutboxEvent
+from events.producers.products_producer import publisher
+
+load_dotenv()
+
+batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+poll_interval = float(os.getenv("OUTBOX_POLL_INTERVAL", 0.5))
+max_backoff = 30
+
+
+def relay_batch() -> int:
+
+    """
+    Publish the oldest pending outbox events to the 'products' exchange and delete them
+    once the broker has accepted them. Rows are claimed with SKIP LOCKED so several
+    relays can run side by side. Returns the number of events relayed.
+    """
+
+    events = (
+        OutboxEvent.query
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not events:
+        db.session.rollback()
+        return 0
+
+    try:
+        publisher.publish_batch([json.loads(event.payload) for event in events])
+        OutboxEvent.query.filter(
+            OutboxEvent.id.in_([event.id for event in events])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(events)
+
+
+def run_relay():
+
+    """
+    Drain the outbox forever: keep relaying full batches back to back, sleep when the
+    outbox is empty and back off exponentially while the broker is unavailable.
+    """
+
+    backoff = 1
+    with app.app_context():
+        while True:
+            try:
+                relayed = relay_batch()
+                backoff = 1
+            except Exception as e:
+                print(f"❌ Outbox relay failed, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, max_backoff)
+                continue
+
+            if relayed < batch_size:
+                time.sleep(poll_interval)
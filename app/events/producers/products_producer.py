@@ -1,28 +1,115 @@
 import os
 import json
 import pika
+import atexit
+import threading
 from dotenv import load_dotenv
+from pika.exceptions import AMQPError
 
 load_dotenv()
 rabbit_mq = os.getenv("RABBIT_MQ_HOST", "rabbitmq")
+products_exchange = "products"
 
-def send_new_product_event(product):
+
+class ProductEventPublisher:
 
     """
-    Publishes a product event to RabbitMQ 'products' fanout exchange with product details
-    (seller_id, name, price, description) serialized as JSON for subscriber notifications.
+    Long-lived RabbitMQ publisher shared by all threads of a worker process.
+    Keeps one connection and one transactional channel open, reconnects on failure
+    (including after a fork), and serializes access with a lock since pika's
+    BlockingConnection is not thread-safe.
     """
 
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbit_mq))
-    channel = connection.channel()
-    channel.exchange_declare(exchange='products', exchange_type='fanout')
+    def __init__(self, host: str, exchange: str = products_exchange, heartbeat: int = 60):
+        self.host = host
+        self.exchange = exchange
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+        self._pid = None
+
+    def _connect(self):
+        self._connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=self.host, heartbeat=self.heartbeat)
+        )
+        self._channel = self._connection.channel()
+        self._channel.exchange_declare(exchange=self.exchange, exchange_type='fanout', durable=True)
+        # BlockingConnection waits for each publisher confirm in turn; a transaction lets
+        # a whole batch be acknowledged by the broker in a single commit round trip.
+        self._channel.tx_select()
+        self._pid = os.getpid()
+
+    def _reset(self):
+        connection, self._connection, self._channel = self._connection, None, None
+        # A connection inherited through fork belongs to the parent; never close it here.
+        if connection is not None and self._pid == os.getpid() and connection.is_open:
+            try:
+                connection.close()
+            except (AMQPError, OSError):
+                pass
+
+    def _get_channel(self):
+        if self._pid != os.getpid():
+            self._connection, self._channel = None, None
+        if self._channel is None or not self._channel.is_open:
+            self._reset()
+            self._connect()
+        else:
+            # Services heartbeats and surfaces a dropped idle connection before publishing.
+            self._connection.process_data_events(time_limit=0)
+        return self._channel
+
+    def publish_batch(self, messages: list[dict]):
+
+        """
+        Publish messages on the shared channel and commit them in one transaction, so the
+        broker has accepted the whole batch when this returns. On a connection error the
+        batch is retried once on a fresh connection, so delivery is at-least-once.
+        """
+
+        if not messages:
+            return
+
+        properties = pika.BasicProperties(content_type="application/json", delivery_mode=2)
+        bodies = [json.dumps(message) for message in messages]
 
-    message = json.dumps({
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    channel = self._get_channel()
+                    for body in bodies:
+                        channel.basic_publish(
+                            exchange=self.exchange,
+                            routing_key='',
+                            body=body,
+                            properties=properties,
+                        )
+                    channel.tx_commit()
+                    return
+                except (AMQPError, OSError):
+                    self._reset()
+                    if attempt:
+                        raise
+
+    def publish(self, message: dict):
+        self.publish_batch([message])
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+
+publisher = ProductEventPublisher(rabbit_mq)
+atexit.register(publisher.close)
+
+
+def product_event_payload(product, event: str = "created") -> dict:
+    return {
+        "event": event,
+        "id": product.id,
         "seller_id": product.seller_id,
         "name": product.name,
         "price": product.price,
         "description": product.description
-    })
-
-    channel.basic_publish(exchange='products', routing_key='', body=message)
-    connection.close()
+    }
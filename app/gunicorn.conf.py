@@ -0,0 +1,59 @@
+"""
+Gunicorn settings for the API, read from ./gunicorn.conf.py by `gunicorn main:app`.
+
+The app is imported once in the master (preload_app) and forked into workers, so the
+heavy langchain/chromadb imports are paid once and shared copy-on-write. Each worker
+serves `threads` requests at a time. The compose file runs two pools from this file:
+`api` for the catalog and `api_ai` for /ai_search, tuned through the WEB_* variables,
+so slow AI searches can never occupy the threads that serve the catalog.
+"""
+
+import os
+import shutil
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("WEB_THREADS", 4))
+worker_class = "gthread"
+# Seconds a worker may go silent before the master restarts it; requests themselves are not cut.
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+# On SIGTERM workers stop accepting and get this long to finish in-flight requests.
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = "-"
+# Workers write metric samples here and /manage/metrics merges them; unset keeps them per worker.
+prometheus_multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+
+    """Start with an empty metrics directory so samples of a previous run are not merged in."""
+
+    if prometheus_multiproc_dir:
+        shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+        os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+
+    """Drop database connections inherited from the master so no socket is shared between workers."""
+
+    from main import app
+    from db.extensions import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if prometheus_multiproc_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,4 +1,6 @@
 import os
+import json
+import hashlib
 from flasgger import Swagger
 from dotenv import load_dotenv
 
@@ -8,6 +10,8 @@ from flask import Flask, request, jsonify
 
 from db.models import *
 from db.extensions import db
+from db.upgrade import upgrade_schema
+from metrics.instrumentation import init_metrics
 
 load_dotenv()
 
@@ -15,22 +19,69 @@ mysql_host_port = os.getenv("MYSQL_HOST_PORT")
 mysql_password=os.getenv("MYSQL_PASSWORD")
 mysql_db=os.getenv("MYSQL_DATABASE")
 mysql_user=os.getenv("MYSQL_USER")
+# Path prefix of a compiled Swagger spec shared by all workers; unset keeps it per process.
+swagger_spec_cache = os.getenv("SWAGGER_SPEC_CACHE")
+swagger_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api", "views", "swagger")
+
+
+class CachedSwagger(Swagger):
+
+    """
+    Swagger whose compiled spec is stored as JSON at SWAGGER_SPEC_CACHE, so workers load
+    one file instead of parsing every endpoint's YAML. The file is keyed by the routes and
+    the YAML files' sizes and modification times and rebuilt when either changes.
+    """
+
+    def _spec_key(self, endpoint: str) -> str:
+        digest = hashlib.sha1(endpoint.encode())
+        for rule in sorted(self.app.url_map.iter_rules(), key=str):
+            digest.update(f"{rule}|{rule.endpoint}|{sorted(rule.methods)}".encode())
+        for root, _, files in sorted(os.walk(swagger_dir)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{root}/{name}|{stat.st_mtime_ns}|{stat.st_size}".encode())
+        return digest.hexdigest()
+
+    def get_apispecs(self, endpoint='apispec_1'):
+        if self.app.debug or not swagger_spec_cache or endpoint in self.apispecs:
+            return super().get_apispecs(endpoint)
+
+        path = f"{swagger_spec_cache}.{endpoint}.json"
+        key = self._spec_key(endpoint)
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached["key"] == key:
+                self.apispecs[endpoint] = cached["spec"]
+                return cached["spec"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        spec = super().get_apispecs(endpoint)
+        try:
+            with open(f"{path}.{os.getpid()}", "w") as f:
+                json.dump({"key": key, "spec": spec}, f)
+            os.replace(f"{path}.{os.getpid()}", path)
+        except (OSError, TypeError):
+            pass
+        return spec
 
 
 def create_app():
 
     """
     Creates and configures the Flask app with:
-    - Swagger API docs,
+    - Swagger API docs (compiled spec cached, see CachedSwagger),
     - MySQL connection via SQLAlchemy,
     - DB migrations support,
+    - Request, SQL and dependency metrics (served at /manage/metrics),
     - Registers all application blueprints for auth, AI search, management, wallet,
       profile, products, and subscriptions,
     - Returns the configured Flask app instance.
     """
 
     app = Flask(__name__)
-    swagger = Swagger(app)
+    swagger = CachedSwagger(app)
 
     app.config['SQLALCHEMY_DATABASE_URI'] = (
         f"mysql+mysqlconnector://{mysql_user}:{mysql_password}"
@@ -39,6 +90,7 @@ def create_app():
     db.init_app(app)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     Migrate(app, db)
+    init_metrics(app)
 
     from api.views.auth import auth_bp
     from api.views.ai import ai_search_bp
@@ -56,12 +108,29 @@ def create_app():
     app.register_blueprint(ai_search_bp)
     app.register_blueprint(subscription_bp)
 
+    @app.cli.command("create-db")
+    def create_db_command():
+
+        """Create missing database tables and upgrade existing ones; run before starting the API workers."""
+
+        init_db()
+
     return app
 
 
+def init_db():
+
+    """
+    Create missing tables and upgrade the ones an older version created. Kept out of the
+    import path so workers boot without touching MySQL.
+    """
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+
 app = create_app()
-with app.app_context():
-    db.create_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+import os
+import time
+import redis
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from flask import g, request, has_request_context
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, SummaryMetricFamily
+
+load_dotenv()
+
+redis_host = os.getenv("REDIS_HOST", "redis")
+# Set for gunicorn pools so every worker's samples are merged into one scrape (see gunicorn.conf.py).
+prometheus_multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if prometheus_multiproc_dir:
+    # Any process of the image may write samples (flask create-db, benchmarks), not only gunicorn workers.
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+cache_schema_version = "v1"
+consumer_stats_key = f"metrics:{cache_schema_version}:consumer"
+
+redis_client = redis.Redis(
+    host=redis_host,
+    port=6379,
+    decode_responses=True,
+    socket_timeout=0.5,
+    socket_connect_timeout=0.5,
+)
+
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+query_count_buckets = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+http_requests = Counter(
+    "excomarket_http_requests_total",
+    "HTTP requests by route and status.",
+    ["method", "endpoint", "status"],
+)
+http_request_duration = Histogram(
+    "excomarket_http_request_duration_seconds",
+    "Time to produce a response (time to first byte for streams).",
+    ["method", "endpoint"],
+    buckets=latency_buckets,
+)
+http_request_db_queries = Histogram(
+    "excomarket_http_request_db_queries",
+    "SQL statements issued while handling one request.",
+    ["method", "endpoint"],
+    buckets=query_count_buckets,
+)
+http_request_db_duration = Histogram(
+    "excomarket_http_request_db_duration_seconds",
+    "Time spent in SQL statements while handling one request.",
+    ["method", "endpoint"],
+    buckets=latency_buckets,
+)
+db_query_duration = Histogram(
+    "excomarket_db_query_duration_seconds",
+    "Duration of single SQL statements by kind.",
+    ["statement"],
+    buckets=latency_buckets,
+)
+dependency_call_duration = Histogram(
+    "excomarket_dependency_call_duration_seconds",
+    "Duration of Chroma and Ollama calls by operation and outcome.",
+    ["service", "operation", "outcome"],
+    buckets=latency_buckets,
+)
+
+statement_kinds = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _endpoint() -> str:
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return kind if kind in statement_kinds else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    # Metrics must never fail the statement they observe.
+    try:
+        db_query_duration.labels(_statement_kind(statement)).observe(elapsed)
+        if has_request_context() and "metrics_started" in g:
+            g.metrics_db_queries += 1
+            g.metrics_db_seconds += elapsed
+    except Exception as e:
+        print(f"⚠️ Could not record SQL metrics: {e}")
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+
+def _start_request_timer():
+    g.metrics_started = time.perf_counter()
+    g.metrics_db_queries = 0
+    g.metrics_db_seconds = 0.0
+
+
+def _observe_request(response):
+    if "metrics_started" not in g:
+        return response
+
+    method, endpoint = request.method, _endpoint()
+    try:
+        http_requests.labels(method, endpoint, str(response.status_code)).inc()
+        http_request_duration.labels(method, endpoint).observe(time.perf_counter() - g.metrics_started)
+        http_request_db_queries.labels(method, endpoint).observe(g.metrics_db_queries)
+        http_request_db_duration.labels(method, endpoint).observe(g.metrics_db_seconds)
+    except Exception as e:
+        print(f"⚠️ Could not record request metrics: {e}")
+    return response
+
+
+def init_metrics(app):
+
+    """Time every request of the app and count the SQL statements it issues."""
+
+    app.before_request(_start_request_timer)
+    app.after_request(_observe_request)
+
+
+def observe_dependency_call(service: str, operation: str, outcome: str, seconds: float):
+    try:
+        dependency_call_duration.labels(service, operation, outcome).observe(seconds)
+    except Exception as e:
+        print(f"⚠️ Could not record dependency metrics: {e}")
+
+
+def record_fanout(recipients: int, sent: int, failed: int, resolve_seconds: float, fanout_seconds: float):
+
+    """
+    Add one product event's fan-out to the consumer stats in Redis, where every consumer
+    process and replica accumulates and the API's /manage/metrics reads them. Best-effort.
+    """
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(consumer_stats_key, "events", 1)
+        pipe.hincrby(consumer_stats_key, "recipients", recipients)
+        pipe.hincrby(consumer_stats_key, "sent", sent)
+        pipe.hincrby(consumer_stats_key, "failed", failed)
+        pipe.hincrbyfloat(consumer_stats_key, "resolve_seconds", resolve_seconds)
+        pipe.hincrbyfloat(consumer_stats_key, "fanout_seconds", fanout_seconds)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+class ConsumerStatsCollector:
+
+    """Exposes the consumer fan-out stats accumulated in Redis; yields nothing while Redis is down."""
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        try:
+            stats = redis_client.hgetall(consumer_stats_key)
+        except redis.RedisError:
+            return
+        if not stats:
+            return
+
+        events = int(stats.get("events", 0))
+        notifications = CounterMetricFamily(
+            "excomarket_consumer_notifications",
+            "Telegram notifications sent by the consumer, by outcome.",
+            labels=["outcome"],
+        )
+        notifications.add_metric(["sent"], int(stats.get("sent", 0)))
+        notifications.add_metric(["failed"], int(stats.get("failed", 0)))
+
+        yield CounterMetricFamily(
+            "excomarket_consumer_events",
+            "Product created events fanned out by the consumer.",
+            value=events,
+        )
+        yield notifications
+        yield SummaryMetricFamily(
+            "excomarket_consumer_fanout_recipients",
+            "Subscribers notified per product event.",
+            count_value=events,
+            sum_value=int(stats.get("recipients", 0)),
+        )
+        yield SummaryMetricFamily(
+            "excomarket_consumer_resolve_duration_seconds",
+            "Time to load subscribers and resolve their chat ids per event.",
+            count_value=events,
+            sum_value=float(stats.get("resolve_seconds", 0)),
+        )
+        yield SummaryMetricFamily(
+            "excomarket_consumer_fanout_duration_seconds",
+            "Time to deliver every notification of an event.",
+            count_value=events,
+            sum_value=float(stats.get("fanout_seconds", 0)),
+        )
+
+
+consumer_registry = CollectorRegistry(auto_describe=False)
+consumer_registry.register(ConsumerStatsCollector())
+
+
+def render_metrics() -> bytes:
+
+    """Prometheus text exposition of this pool's metrics (all workers merged) and the consumer stats."""
+
+    if prometheus_multiproc_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(consumer_registry)
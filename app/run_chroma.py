@@ -1,4 +1,6 @@
 if __name__ == "__main__":
+    import sys
+
     from chroma.index_products import index_products
 
-    index_products()
+    index_products(fresh="--fresh" in sys.argv)
@@ -0,0 +1,6 @@
+if __name__ == "__main__":
+    import sys
+
+    from chroma.indexer import run_indexer
+
+    run_indexer(catch_up_only="--catch-up" in sys.argv)
@@ -1,4 +1,4 @@
 if __name__ == "__main__":
-    from events.consumers.products_consumer import consume
+    from events.consumers.products_consumer import run_workers
 
-    consume()
+    run_workers()
@@ -0,0 +1,4 @@
+if __name__ == "__main__":
+    from events.producers.outbox_relay import run_relay
+
+    run_relay()
@@ -0,0 +1,14 @@
+if __name__ == "__main__":
+    import os
+    import time
+
+    from main import app
+    from api.views.services.wallet_service import compact_wallet_snapshots
+
+    interval = int(os.getenv("WALLET_SNAPSHOT_INTERVAL", 60))
+    watermark = 0
+
+    with app.app_context():
+        while True:
+            watermark = compact_wallet_snapshots(since_entry_id=watermark)
+            time.sleep(interval)